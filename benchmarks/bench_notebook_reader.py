@@ -0,0 +1,75 @@
+"""Compare json.load with the streaming cell reader on a notebook with heavy outputs.
+
+Run with ``python -m benchmarks.bench_notebook_reader [--output-mb 50]``.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SyntheticCohort
+from iust_ai_toolkit.notebook_reader import iter_notebook_cells
+
+
+def write_heavy_notebook(path: str, code_cells: int, output_mb: float):
+    """Write a notebook whose code cells each embed a base64 PNG-sized output blob."""
+    cohort = SyntheticCohort(
+        size=1, code_cells=code_cells, output_kb=int(output_mb * 1024 / max(1, code_cells))
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cohort.notebook(cohort.cohort_cells()[0], 0), f)
+
+
+def json_load_cells(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        nb = json.load(f)
+    return [{"cell_type": c["cell_type"], "source": c["source"]} for c in nb["cells"]]
+
+
+def streaming_cells(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return list(iter_notebook_cells(f))
+
+
+def measure(fn, path: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--code-cells", type=int, default=20)
+    parser.add_argument("--output-mb", type=float, default=50.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "heavy.ipynb")
+        write_heavy_notebook(path, args.code_cells, args.output_mb)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Notebook: {size_mb:.1f} MiB, {args.code_cells} code cells")
+
+        baseline = None
+        for name, fn in (("json.load", json_load_cells), ("streaming", streaming_cells)):
+            seconds, peak, result = measure(fn, path, args.repeat)
+            if baseline is None:
+                baseline = result
+            elif result != baseline:
+                raise AssertionError(f"{name} returned different cells than json.load")
+            print(f"{name:>10}: {seconds * 1000:8.1f} ms  peak {peak / (1024 * 1024):8.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
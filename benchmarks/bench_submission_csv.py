@@ -0,0 +1,83 @@
+"""Compare the old pandas ``create_submission_csv`` with the streaming writer.
+
+Run with ``python -m benchmarks.bench_submission_csv [--rows 10000000]``. Each variant runs
+in a fresh process; memory is the growth of its peak RSS while writing, on top of the
+predictions themselves.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from iust_ai_toolkit.profiling import peak_rss_mb
+
+
+def _predictions(kind: str, rows: int):
+    import numpy as np
+
+    if kind == "generator":
+        return (i % 7 for i in range(rows))
+    array = np.arange(rows, dtype=np.int64) % 7
+    return array.tolist() if kind == "list" else array
+
+
+def _pandas_write(predictions, path: str):
+    """The previous implementation."""
+    import pandas as pd
+
+    df = pd.DataFrame()
+    df["id"] = list(range(1, len(predictions) + 1))
+    df["prediction"] = predictions
+    df.to_csv(path, index=False)
+
+
+def _run(variant: str, kind: str, rows: int, path: str, queue):
+    # Import both writers first so neither is charged for module loading
+    import pandas  # noqa: F401
+
+    from iust_ai_toolkit.predictions import write_predictions_csv
+
+    predictions = _predictions(kind, rows)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if variant == "pandas":
+        _pandas_write(predictions, path)
+    else:
+        write_predictions_csv(predictions, path)
+    queue.put((time.perf_counter() - start, peak_rss_mb() - before, os.path.getsize(path)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    variants = [
+        ("pandas", "array"),
+        ("pandas", "list"),
+        ("streaming", "array"),
+        ("streaming", "list"),
+        ("streaming", "generator"),
+        ("streaming", "array", ".gz"),
+    ]
+    print(f"{args.rows} predictions")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for variant, kind, *suffix in variants:
+            path = os.path.join(tmp_dir, f"submission.csv{''.join(suffix)}")
+            queue = context.Queue()
+            process = context.Process(target=_run, args=(variant, kind, args.rows, path, queue))
+            process.start()
+            seconds, memory_mb, size = queue.get()
+            process.join()
+            label = f"{variant} ({kind}{', gzip' if suffix else ''})"
+            print(
+                f"{label:<28} {seconds:7.2f} s  {args.rows / seconds / 1e6:5.2f} M rows/s  "
+                f"+{memory_mb:7.1f} MiB peak  {size / 1024 / 1024:6.1f} MiB file"
+            )
+
+
+if __name__ == "__main__":
+    main()
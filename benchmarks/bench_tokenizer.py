@@ -0,0 +1,112 @@
+"""Compare tokenizer backends on a synthetic cohort: speed and agreement with NLTK.
+
+Run with ``python -m benchmarks.bench_tokenizer [--size 200]``. The ``nltk`` backend
+needs the ``punkt``, ``stopwords`` and ``wordnet`` corpora; agreement is reported as
+
+- the mean Jaccard overlap of each cell's token set under both backends,
+- the Pearson correlation of pairwise cell similarity (TF-IDF cosine) across the cohort,
+- the overlap of the pairs flagged at the cheating threshold by each backend.
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticCohort
+from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission
+from iust_ai_toolkit.tokenizers import get_tokenizer
+
+
+def tokenize_cohort(name: str, cohort_cells: List[List[str]], repeat: int):
+    tokenizer = get_tokenizer(name)
+    tokenizer.prepare()
+    cells = [cell for cells in cohort_cells for cell in cells]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = [tokenizer.tokenize(cell) for cell in cells]
+        timings.append(time.perf_counter() - start)
+    return min(timings), tokens
+
+
+def cell_similarity(cohort_cells: List[List[str]], tokens: List[List[str]]) -> np.ndarray:
+    texts = []
+    position = 0
+    for cells in cohort_cells:
+        texts.append(" ".join(" ".join(t) for t in tokens[position : position + len(cells)]))
+        position += len(cells)
+    model = DecisionTreeSubmission.fit_tfidf_model(texts)
+    tfidf = DecisionTreeSubmission.transform_tfidf(model, texts)
+    return (tfidf @ tfidf.T).toarray()
+
+
+def agreement(cohort_cells, reference: List[List[str]], candidate: List[List[str]], threshold):
+    jaccard = [
+        len(set(a) & set(b)) / len(set(a) | set(b)) if set(a) | set(b) else 1.0
+        for a, b in zip(reference, candidate)
+    ]
+    upper = np.triu_indices(len(cohort_cells), k=1)
+    reference_scores = cell_similarity(cohort_cells, reference)[upper]
+    candidate_scores = cell_similarity(cohort_cells, candidate)[upper]
+    reference_flags = reference_scores >= threshold
+    candidate_flags = candidate_scores >= threshold
+    flagged = (reference_flags | candidate_flags).sum()
+    return {
+        "mean_cell_jaccard": float(np.mean(jaccard)),
+        "similarity_correlation": float(np.corrcoef(reference_scores, candidate_scores)[0, 1]),
+        "mean_abs_similarity_difference": float(np.abs(reference_scores - candidate_scores).mean()),
+        "flagged_pairs": {
+            "reference": int(reference_flags.sum()),
+            "candidate": int(candidate_flags.sum()),
+            "both": int((reference_flags & candidate_flags).sum()),
+            "agreement": (
+                float((reference_flags & candidate_flags).sum() / flagged) if flagged else 1.0
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--plagiarism-rate", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    cohort_cells = SyntheticCohort(
+        size=args.size, plagiarism_rate=args.plagiarism_rate
+    ).cohort_cells()
+    cell_count = sum(len(cells) for cells in cohort_cells)
+    print(f"Cohort: {args.size} students, {cell_count} code cells")
+
+    results: Dict[str, tuple] = {}
+    for name in ("nltk", "code"):
+        try:
+            results[name] = tokenize_cohort(name, cohort_cells, args.repeat)
+        except (ImportError, LookupError) as e:
+            print(f"{name:>5}: unavailable ({type(e).__name__}); install nltk and its corpora")
+            continue
+        seconds, tokens = results[name]
+        print(
+            f"{name:>5}: {seconds * 1000:8.1f} ms  "
+            f"{cell_count / seconds:10.0f} cells/s  {sum(map(len, tokens))} tokens"
+        )
+
+    if len(results) == 2:
+        print(f"Speed-up: {results['nltk'][0] / results['code'][0]:.1f}x")
+        stats = agreement(cohort_cells, results["nltk"][1], results["code"][1], args.threshold)
+        print(f"Mean cell token Jaccard: {stats['mean_cell_jaccard']:.3f}")
+        print(f"Cell similarity correlation: {stats['similarity_correlation']:.3f}")
+        print(f"Mean |similarity difference|: {stats['mean_abs_similarity_difference']:.3f}")
+        flags = stats["flagged_pairs"]
+        print(
+            f"Pairs flagged at {args.threshold:.2f}: nltk {flags['reference']}, "
+            f"code {flags['candidate']}, both {flags['both']} ({flags['agreement']:.1%} agreement)"
+        )
+
+
+if __name__ == "__main__":
+    main()
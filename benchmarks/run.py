@@ -0,0 +1,196 @@
+"""Scaling benchmarks for the submission pipeline on synthetic cohorts.
+
+Each stage runs in a fresh process so its peak RSS is not inflated by earlier stages::
+
+    python -m benchmarks.run --sizes 50 200 1000 --output bench.json
+    python -m benchmarks.run --sizes 50 200 1000 --compare bench.json
+
+Stages: ``encode_notebook``, ``create_submission_zip``, ``compare_submissions`` (a
+fixed sample of pairs) and ``analyze_all_submissions`` (every pair, streamed).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Dict, List
+
+from benchmarks.synthetic import SyntheticCohort
+from iust_ai_toolkit.profiling import peak_rss_mb
+
+STAGES = [
+    "encode_notebook",
+    "create_submission_zip",
+    "compare_submissions",
+    "analyze_all_submissions",
+]
+COMPARE_SAMPLE = 50
+
+
+def _notebooks(workdir: str) -> List[str]:
+    directory = os.path.join(workdir, "notebooks")
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+
+def _submissions(workdir: str) -> List[str]:
+    return sorted(os.listdir(os.path.join(workdir, "submissions")))
+
+
+def _stage_encode_notebook(workdir: str, workers: int) -> int:
+    from iust_ai_toolkit.base_authenticator import BaseAuthenticator
+
+    authenticator = BaseAuthenticator(workdir)
+    notebooks = _notebooks(workdir)
+    for path in notebooks:
+        authenticator.encode_notebook(path)
+    return len(notebooks)
+
+
+def _stage_create_submission_zip(workdir: str, workers: int) -> int:
+    cohort = SyntheticCohort()
+    return len(cohort.write_submissions(_notebooks(workdir), os.path.join(workdir, "submissions")))
+
+
+def _stage_compare_submissions(workdir: str, workers: int) -> int:
+    from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission
+
+    authenticator = DecisionTreeSubmission(os.path.join(workdir, "submissions"), use_cache=False)
+    student_ids = [name.split("-")[0] for name in _submissions(workdir)]
+    pairs = list(zip(student_ids, student_ids[1:]))[:COMPARE_SAMPLE]
+    for student_id1, student_id2 in pairs:
+        authenticator.compare_submissions(student_id1, student_id2)
+    return len(pairs)
+
+
+def _stage_analyze_all_submissions(workdir: str, workers: int) -> int:
+    from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission
+
+    authenticator = DecisionTreeSubmission(os.path.join(workdir, "submissions"), use_cache=False)
+    pairs = 0
+    for _ in authenticator.iter_pair_results(_submissions(workdir), workers=workers, verbose=False):
+        pairs += 1
+    return pairs
+
+
+def _stage_worker(stage: str, workdir: str, workers: int, queue):
+    # Import the scientific stack up front so the timings measure the stage, not imports
+    import numpy  # noqa: F401
+    import scipy.sparse  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+
+    stage_fn = globals()[f"_stage_{stage}"]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = stage_fn(workdir, workers)
+    wall = time.perf_counter() - start
+    queue.put({"items": items, "wall_seconds": wall, "peak_rss_mb": peak_rss_mb()})
+
+
+def run_stage(stage: str, workdir: str, workers: int = 1) -> Dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_stage_worker, args=(stage, workdir, workers, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    result["throughput"] = result["items"] / result["wall_seconds"] if result["wall_seconds"] else 0
+    return result
+
+
+def run_benchmarks(cohorts: List[SyntheticCohort], stages: List[str], workers: int) -> List[Dict]:
+    results = []
+    for cohort in cohorts:
+        with tempfile.TemporaryDirectory() as workdir:
+            cohort.write_notebooks(os.path.join(workdir, "notebooks"))
+            os.makedirs(os.path.join(workdir, "submissions"))
+            # Later stages read the zips, so packaging always runs even if not reported
+            needed = STAGES[: max(STAGES.index(stage) for stage in stages) + 1]
+            for stage in needed:
+                result = run_stage(stage, workdir, workers)
+                if stage in stages:
+                    result.update(stage=stage, cohort_size=cohort.size)
+                    results.append(result)
+                    print(
+                        f"{stage:>24} n={cohort.size:<6} {result['wall_seconds']:9.3f} s "
+                        f"{result['peak_rss_mb']:9.1f} MiB {result['throughput']:12.1f} items/s"
+                    )
+    return results
+
+
+def toolkit_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("iust_ai_toolkit")
+    except Exception:
+        return "unknown"
+
+
+def compare(results: List[Dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["cohort_size"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (ratio = current / baseline):")
+    for result in results:
+        previous = baseline.get((result["stage"], result["cohort_size"]))
+        if previous is None:
+            continue
+        print(
+            f"{result['stage']:>24} n={result['cohort_size']:<6} "
+            f"time x{result['wall_seconds'] / previous['wall_seconds']:.2f}  "
+            f"rss x{result['peak_rss_mb'] / previous['peak_rss_mb']:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--code-cells", type=int, default=12)
+    parser.add_argument("--lines-per-cell", type=int, default=15)
+    parser.add_argument("--output-kb", type=int, default=0)
+    parser.add_argument("--plagiarism-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output run")
+    args = parser.parse_args()
+
+    cohorts = [
+        SyntheticCohort(
+            size=size,
+            code_cells=args.code_cells,
+            lines_per_cell=args.lines_per_cell,
+            output_kb=args.output_kb,
+            plagiarism_rate=args.plagiarism_rate,
+            seed=args.seed,
+        )
+        for size in args.sizes
+    ]
+    results = run_benchmarks(cohorts, args.stages, args.workers)
+
+    if args.output:
+        report = {
+            "toolkit_version": toolkit_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": args.workers,
+            "cohorts": [asdict(cohort) for cohort in cohorts],
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Deterministic synthetic decision-tree notebooks and submission cohorts for benchmarks."""
+
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+
+_IDENTIFIERS = [
+    "gini", "entropy", "impurity", "split", "threshold", "feature", "node", "leaf",
+    "depth", "max_depth", "min_samples", "samples", "labels", "counts", "gain", "best",
+    "left", "right", "tree", "root", "value", "prediction", "probability", "weights",
+]  # fmt: skip
+_METHODS = [
+    "fit", "predict", "predict_proba", "gini_impurity", "entropy", "information_gain",
+    "best_split", "build_tree", "prune", "score", "_split_node", "_leaf_value",
+    "_traverse", "feature_importances", "print_tree",
+]  # fmt: skip
+_ESTIMATION_KEYS = ["train_accuracy", "test_accuracy", "tree_depth", "leaf_count"]
+
+
+@dataclass
+class SyntheticCohort:
+    """Parameters of a generated cohort; the same parameters always produce the same files.
+
+    ``plagiarism_rate`` is the fraction of students whose notebook is a lightly edited
+    copy of an earlier student's notebook. ``output_kb`` adds a base64 "plot" of that
+    size to every code cell, like the tree plots students embed. ``template_cells`` starter
+    cells, the same for everyone, come first in every notebook (see ``template_notebook``).
+    """
+
+    size: int = 50
+    code_cells: int = 12
+    lines_per_cell: int = 15
+    output_kb: int = 0
+    plagiarism_rate: float = 0.1
+    seed: int = 0
+    template_cells: int = 0
+
+    def student_id(self, index: int) -> str:
+        return f"{9900000 + index}"
+
+    def _original_cells(self, rng: random.Random) -> List[str]:
+        methods = rng.sample(_METHODS, min(len(_METHODS), self.code_cells))
+        cells = []
+        for cell_index in range(self.code_cells):
+            lines = []
+            if cell_index < len(methods):
+                lines.append(f"def {methods[cell_index]}(self, X, y=None):")
+            for _ in range(self.lines_per_cell):
+                target, left, right = rng.sample(_IDENTIFIERS, 3)
+                op = rng.choice(["+", "-", "*", "/", "**"])
+                lines.append(f"    {target} = {left} {op} {right} * {rng.randint(0, 99)}")
+            if cell_index < len(_ESTIMATION_KEYS):
+                value = round(rng.uniform(0.5, 1.0), 3)
+                lines.append(f"# Estimation: {_ESTIMATION_KEYS[cell_index]}: {value}")
+            cells.append("\n".join(lines) + "\n")
+        return cells
+
+    @staticmethod
+    def _plagiarise(cells: List[str], rng: random.Random) -> List[str]:
+        """Copy ``cells`` with a few identifiers renamed and the odd comment added."""
+        renames = {name: f"{name}_{rng.randint(0, 9)}" for name in rng.sample(_IDENTIFIERS, 3)}
+        copied = []
+        for cell in cells:
+            for old, new in renames.items():
+                cell = cell.replace(f" {old} ", f" {new} ")
+            if rng.random() < 0.3:
+                cell += f"    # tweaked {rng.randint(0, 999)}\n"
+            copied.append(cell)
+        return copied
+
+    def starter_cells(self) -> List[str]:
+        rng = random.Random(f"template-{self.seed}")
+        cells = []
+        for cell_index in range(self.template_cells):
+            lines = [f"# Starter code, part {cell_index + 1}: do not modify"]
+            for _ in range(self.lines_per_cell):
+                target, left, right = rng.sample(_IDENTIFIERS, 3)
+                lines.append(
+                    f"{target}_{cell_index} = load_{left}({right}, seed={rng.randint(0, 99)})"
+                )
+            cells.append("\n".join(lines) + "\n")
+        return cells
+
+    def cohort_cells(self) -> List[List[str]]:
+        rng = random.Random(self.seed)
+        cohort = []
+        for index in range(self.size):
+            if index > 0 and rng.random() < self.plagiarism_rate:
+                cohort.append(self._plagiarise(cohort[rng.randrange(index)], rng))
+            else:
+                cohort.append(self._original_cells(rng))
+        starter = self.starter_cells()
+        return [starter + cells for cells in cohort] if starter else cohort
+
+    def notebook(self, cells: List[str], index: int) -> Dict:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        nb_cells = []
+        for execution_count, source in enumerate(cells, start=1):
+            outputs = []
+            if self.output_kb:
+                blob = rng.getrandbits(self.output_kb * 1024 * 6).to_bytes(
+                    self.output_kb * 768, "little"
+                )
+                outputs.append(
+                    {
+                        "output_type": "display_data",
+                        "data": {
+                            "image/png": base64.b64encode(blob).decode(),
+                            "text/plain": ["<Figure size 640x480 with 1 Axes>"],
+                        },
+                        "metadata": {},
+                    }
+                )
+            nb_cells.append(
+                {"cell_type": "markdown", "metadata": {}, "source": [f"## Step {execution_count}"]}
+            )
+            nb_cells.append(
+                {
+                    "cell_type": "code",
+                    "execution_count": execution_count,
+                    "metadata": {},
+                    "outputs": outputs,
+                    "source": source.splitlines(keepends=True),
+                }
+            )
+        return {
+            "cells": nb_cells,
+            "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        }
+
+    def template_notebook(self, path: str) -> str:
+        """Write the starter notebook handed out to students."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.notebook(self.starter_cells(), -1), f)
+        return path
+
+    def write_notebooks(self, directory: str) -> List[str]:
+        """Write one ``<student_id>.ipynb`` per student and return the paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for index, cells in enumerate(self.cohort_cells()):
+            path = os.path.join(directory, f"{self.student_id(index)}.ipynb")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.notebook(cells, index), f)
+            paths.append(path)
+        return paths
+
+    def write_submissions(self, notebook_paths: List[str], directory: str) -> List[str]:
+        """Package notebooks as ``<student_id>-decision_tree_submission.zip`` files."""
+        from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission
+
+        authenticator = DecisionTreeSubmission(directory, use_cache=False)
+        names = []
+        for path in notebook_paths:
+            student_id = os.path.splitext(os.path.basename(path))[0]
+            name = f"{student_id}-decision_tree_submission.zip"
+            with contextlib.redirect_stdout(io.StringIO()):
+                authenticator.create_submission_zip(student_id, path, os.path.join(directory, name))
+            names.append(name)
+        return names
@@ -1,7 +1,12 @@
 import importlib
 
-from . import cli
-from .abdi_4031 import decision_tree_submission
+# Submodules are imported on first access so that `iust-ai --help` and other light code
+# paths do not pay for loading the course packages and their dependencies.
+_LAZY_SUBMODULES = {
+    "cli": "iust_ai_toolkit.cli",
+    "abdi_4031": "iust_ai_toolkit.abdi_4031",
+    "decision_tree_submission": "iust_ai_toolkit.abdi_4031.decision_tree_submission",
+}
 
 
 def course_module(module_name: str):
@@ -10,4 +15,12 @@ def course_module(module_name: str):
     return module
 
 
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        module = importlib.import_module(_LAZY_SUBMODULES[name])
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 name = "iust_ai_toolkit"
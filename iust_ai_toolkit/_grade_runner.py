@@ -0,0 +1,103 @@
+"""Child process of ``grading.Autograder``: fit and score one submission's model.
+
+Run as ``python -E _grade_runner.py RESULT_PATH CPU_SECONDS MEMORY_MB MODULE CLASS PARAMS
+DATASET...`` with the unpacked submission as the working directory. The process limits
+itself before anything else is imported (0 means no limit). Only the standard library
+and numpy are imported, and results are rewritten after every dataset so a run that is
+killed for its time or memory still reports the datasets it finished.
+"""
+
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+
+# Largest file a submission may write
+_MAX_FILE_SIZE = 64 * 1024 * 1024
+
+
+def _peak_memory_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _limit_resources(cpu_seconds: int, memory_mb: int):
+    try:
+        import resource
+    except ImportError:  # Windows: only the parent's timeout applies
+        return
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (_MAX_FILE_SIZE, _MAX_FILE_SIZE))
+    if cpu_seconds:
+        # SIGXCPU at the soft limit, SIGKILL a second later if it is caught
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except ValueError:  # not enforced on macOS
+            pass
+
+
+def _write(path: str, results):
+    with open(path + ".tmp", "w") as f:
+        json.dump(results, f)
+    os.replace(path + ".tmp", path)
+
+
+def _error(e: BaseException) -> str:
+    frame = traceback.extract_tb(e.__traceback__)[-1:] if e.__traceback__ else []
+    where = f" ({os.path.basename(frame[0].filename)}:{frame[0].lineno})" if frame else ""
+    return f"{type(e).__name__}: {e}{where}"[:500]
+
+
+def main(argv):
+    result_path, cpu_seconds, memory_mb, module_name, class_name, params, *datasets = argv
+    _limit_resources(int(cpu_seconds), int(memory_mb))
+    # Replace this script's directory with the submission's
+    sys.path[0] = os.getcwd()
+    results = []
+
+    try:
+        import numpy as np
+
+        model_class = getattr(importlib.import_module(module_name), class_name)
+    except BaseException as e:
+        status = "memory" if isinstance(e, MemoryError) else "import_error"
+        results = [{"dataset": d, "status": status, "error": _error(e)} for d in datasets]
+        _write(result_path, results)
+        return
+
+    for dataset in datasets:
+        result = {"dataset": dataset}
+        try:
+            data = np.load(dataset, allow_pickle=True)
+            model = model_class(**json.loads(params))
+            start = time.perf_counter()
+            model.fit(data["X_train"], data["y_train"])
+            result["fit_seconds"] = time.perf_counter() - start
+            start = time.perf_counter()
+            predictions = np.asarray(model.predict(data["X_test"])).reshape(-1)
+            result["predict_seconds"] = time.perf_counter() - start
+            if len(predictions) != len(data["y_test"]):
+                raise ValueError(
+                    f"predict returned {len(predictions)} labels for {len(data['y_test'])} rows"
+                )
+            result["accuracy"] = float(np.mean(predictions == data["y_test"]))
+            result["status"] = "ok"
+        except BaseException as e:
+            result["status"] = "memory" if isinstance(e, MemoryError) else "error"
+            result["error"] = _error(e)
+        result["peak_memory_mb"] = _peak_memory_mb()
+        results.append(result)
+        _write(result_path, results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,97 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Estimations closer than this are considered equal (see estimation_similarity)
+ESTIMATION_TOLERANCE = 1e-6
+
+
+def _incidence(rows: List[List], columns: Dict) -> csr_matrix:
+    indptr = [0]
+    indices = []
+    for keys in rows:
+        for key in keys:
+            indices.append(columns.setdefault(key, len(columns)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float64)
+    return csr_matrix((data, indices, indptr), shape=(len(rows), max(1, len(columns))))
+
+
+class CohortMatrices:
+    """Sparse matrices that score blocks of submission pairs without per-pair Python work.
+
+    - ``tfidf``: L2-normalised TF-IDF rows, so ``tfidf @ tfidf.T`` is the cell similarity.
+    - ``methods``: student x method-signature incidence; the product with its transpose
+      counts shared methods.
+    - ``estimations``: student x (key, value) incidence with values quantised to
+      ``ESTIMATION_TOLERANCE``; the product counts matching estimations. Infinite and NaN
+      values never match, as in ``estimation_similarity``, so they have no column but still
+      count towards the per-student totals.
+
+    Method and estimation counts are normalised by the larger of the two per-student
+    totals, exactly like ``method_similarity`` and ``estimation_similarity``.
+    """
+
+    def __init__(self, tfidf, features: List[Dict]):
+        self.tfidf = csr_matrix(tfidf)
+        self.methods = _incidence([set(f["implemented_methods"]) for f in features], {})
+        self.method_counts = np.array(
+            [len(f["implemented_methods"]) for f in features], dtype=np.float64
+        )
+        self.estimations = _incidence(
+            [
+                {
+                    (key, round(value / ESTIMATION_TOLERANCE))
+                    for key, value in f["estimations"].items()
+                    if math.isfinite(value)
+                }
+                for f in features
+            ],
+            {},
+        )
+        self.estimation_counts = np.array(
+            [len(f["estimations"]) for f in features], dtype=np.float64
+        )
+
+        # Transposes for the common "against every submission" case, built once
+        self._transposed = tuple(m.T.tocsr() for m in (self.tfidf, self.methods, self.estimations))
+
+    def __len__(self) -> int:
+        return self.tfidf.shape[0]
+
+    @staticmethod
+    def _normalise(shared: np.ndarray, row_counts: np.ndarray, col_counts: np.ndarray):
+        longest = np.maximum(row_counts[:, None], col_counts[None, :])
+        return np.divide(shared, longest, out=np.zeros_like(shared), where=longest > 0)
+
+    def block(
+        self, rows, cols: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return dense ``(cell, method, estimation, overall)`` arrays for ``rows x cols``.
+
+        ``rows`` and ``cols`` are anything that indexes matrix rows (a slice or an index
+        array); ``cols=None`` means every submission.
+        """
+        if cols is None:
+            cols = slice(None)
+            tfidf_t, methods_t, estimations_t = self._transposed
+        else:
+            tfidf_t = self.tfidf[cols].T
+            methods_t = self.methods[cols].T
+            estimations_t = self.estimations[cols].T
+
+        cell = (self.tfidf[rows] @ tfidf_t).toarray()
+        method = self._normalise(
+            (self.methods[rows] @ methods_t).toarray(),
+            self.method_counts[rows],
+            self.method_counts[cols],
+        )
+        estimation = self._normalise(
+            (self.estimations[rows] @ estimations_t).toarray(),
+            self.estimation_counts[rows],
+            self.estimation_counts[cols],
+        )
+        overall = (cell + method + estimation) / 3
+        return cell, method, estimation, overall
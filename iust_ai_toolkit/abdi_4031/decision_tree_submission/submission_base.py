@@ -1,78 +1,382 @@
-import json
+import contextlib
 import os
 import zipfile
-from typing import Dict, List, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 from ...base_authenticator import BaseAuthenticator, is_library_installed
+from ...feature_cache import CACHE_DIR_NAME, DEFAULT_MAX_SIZE, FeatureCache
+from ...payload import read_payload, write_payload, zip_member
+from ...profiling import NULL_PROFILER
+from ...similarity_index import INDEX_FILE_NAME, SimilarityIndex
+from ...submission_sources import (
+    SUBMISSION_SUFFIX,
+    SubmissionSource,
+    find_submission_sources,
+    open_submission,
+)
+from ...templates import cell_hash, template_cell_hashes, template_digest
+from ...tokenizers import DEFAULT_TOKENIZER, get_tokenizer
+
+# Default memory budget for the score blocks of iter_pair_results
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+# Distinct preprocessed cells kept for reuse across submissions before the memo is reset
+MAX_CELL_TERMS = 100_000
+# refresh_index refits TF-IDF when new submissions bring this share of unseen terms
+REFIT_UNSEEN_TERMS = 0.2
+
+if TYPE_CHECKING:
+    from ...lsh import MinHashLSH
+    from .cohort import CohortMatrices
 
 
 class DecisionTreeSubmission(BaseAuthenticator):
-    def __init__(self, base_dir: str = None):
+    # Bump whenever extract_features changes so stale cache entries are not reused
+    FEATURE_VERSION = "1"
+
+    def __init__(
+        self,
+        base_dir: str = None,
+        use_cache: bool = True,
+        cache_size: int = DEFAULT_MAX_SIZE,
+        tokenizer: str = DEFAULT_TOKENIZER,
+        template: Optional[str] = None,
+    ):
         super().__init__(base_dir)
 
         self.cheating_threshold = 0.8  # Similarity threshold for potential cheating
         self.ignore_cheating_percentage = (
             0.7  # Ignore cheating if this percentage of students are classified as cheating
         )
+        self.tokenizer = get_tokenizer(tokenizer)
+        self.feature_cache = (
+            FeatureCache(os.path.join(self.base_dir, CACHE_DIR_NAME), cache_size)
+            if use_cache
+            else None
+        )
+        self._features = {}
+        # Key of each student's entry in _features, so prune_memos can drop stale ones
+        self._feature_keys: Dict[str, str] = {}
+        # Hashes of the starter notebook's code cells, dropped before scoring
+        self.template_hashes = template_cell_hashes(template) if template else frozenset()
+        # Preprocessed text of every distinct cell seen so far, by content hash
+        self._cell_terms: Dict[str, str] = {}
+        # Submissions found by find_submissions that are not plain zips in base_dir
+        self.sources: Dict[str, SubmissionSource] = {}
+        # Export archives opened by load_encoded_data, kept open until close()
+        self._archives = {}
+        # (fingerprints, tfidf_model, CohortMatrices) reused by nearest() while the cohort
+        # and the model are unchanged
+        self._nearest_cohort = None
+        # Replace with a profiling.StageProfiler to time the comparison pipeline
+        self.profiler = NULL_PROFILER
+
+    def close(self):
+        """Close the export archives opened while reading submissions."""
+        for f in self._archives.values():
+            f.close()
+        self._archives.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def create_submission_zip(
+        self,
+        student_id: str,
+        notebook_path: str,
+        zip_path: Optional[str] = None,
+        compresslevel: Optional[int] = None,
+        decision_tree_path: Optional[str] = None,
+    ) -> str:
+        if zip_path is None:
+            notebook_name = os.path.basename(notebook_path)
+            zip_path = os.path.join(
+                self.base_dir, f"{notebook_name}_{student_id}-decision_tree.zip"
+            )
+        extra_files = [
+            ("questions.docx", os.path.join(self.base_dir, "..", "questions.docx")),
+            (
+                "decision_tree.py",
+                decision_tree_path or os.path.join(self.base_dir, "..", "decision_tree.py"),
+            ),
+        ]
+        extra_files = [(name, path) for name, path in extra_files if os.path.exists(path)]
+        self.write_submission_zip(notebook_path, zip_path, compresslevel, extra_files)
+        print(
+            f"Submission for {student_id} (decision_tree_submission) saved successfully as {zip_path}"
+        )
+        return zip_path
+
+    def write_submission_zip(
+        self,
+        notebook_path: str,
+        zip_path: str,
+        compresslevel: Optional[int] = None,
+        extra_files: Iterable[Tuple[str, str]] = (),
+    ) -> int:
+        """Package a notebook and return the number of notebook bytes read.
 
-    def create_submission_zip(self, student_id: str, notebook_path: str):
-        notebook_name = os.path.basename(notebook_path)
-        encoded_data = self.encode_notebook(notebook_path)
+        Members are stored unless ``compresslevel`` (0-9) asks for deflate. Timestamps and
+        permissions are fixed, so the same inputs always give a byte-identical zip. The
+        notebook is read once and used for both the archived copy and the payload.
+        ``extra_files`` are ``(name, path)`` pairs added as they are; a missing one raises.
+        """
+        with open(notebook_path, "rb") as f:
+            notebook = f.read()
+        encoded_data = self.encode_notebook_content(notebook)
 
-        zip_path = os.path.join(self.base_dir, f"{notebook_name}_{student_id}-decision_tree.zip")
-        with zipfile.ZipFile(zip_path, "w") as zipf:
+        compression = zipfile.ZIP_STORED if compresslevel is None else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(zip_path, "w", compression, compresslevel=compresslevel) as zipf:
             # Add the original notebook
-            zipf.write(notebook_path, os.path.basename(notebook_path))
+            zipf.writestr(
+                zip_member(os.path.basename(notebook_path), compression),
+                notebook,
+                compresslevel=compresslevel,
+            )
 
             # Add encoded notebook data
-            encoded_notebook_json = json.dumps(encoded_data)
-            zipf.writestr("encoded_notebook.json", encoded_notebook_json)
+            write_payload(zipf, encoded_data)
 
-            # Add questions.docx
-            questions_path = os.path.join(self.base_dir, "..", "questions.docx")
-            if os.path.exists(questions_path):
-                zipf.write(questions_path, "questions.docx")
+            # Add questions.docx and decision_tree.py
+            for name, path in extra_files:
+                with open(path, "rb") as f:
+                    zipf.writestr(
+                        zip_member(name, compression), f.read(), compresslevel=compresslevel
+                    )
+        return len(notebook)
 
-            # Add d.py
-            d_path = os.path.join(self.base_dir, "..", "decision_tree.py")
-            if os.path.exists(d_path):
-                zipf.write(d_path, "decision_tree.py")
+    def pack_submissions(
+        self,
+        jobs: Iterable[Tuple[str, str, Optional[str]]],
+        output_dir: str,
+        workers: int = 1,
+        compresslevel: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Optional[str], int, Optional[str]]]:
+        """Package many notebooks, on ``workers`` processes.
 
-        print(
-            f"Submission for {student_id} (decision_tree_submission) saved successfully as {zip_path}"
-        )
+        ``jobs`` are ``(student_id, notebook_path, decision_tree_path)``; each becomes
+        ``<student_id>-decision_tree_submission.zip`` in ``output_dir``, holding only the
+        files the job names (no ``decision_tree.py`` when its path is ``None``). Yields
+        ``(student_id, zip_path, notebook_bytes, error)`` in job order; a failed job has
+        no zip and an error message instead of stopping the batch.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = [
+            (
+                student_id,
+                notebook,
+                decision_tree,
+                os.path.join(output_dir, student_id + SUBMISSION_SUFFIX),
+            )
+            for student_id, notebook, decision_tree in jobs
+        ]
+        if workers <= 1:
+            for job in jobs:
+                yield _pack_with(self, compresslevel, job)
+            return
 
-    def init_nltk(self):
-        import nltk
-        from nltk.corpus import stopwords
-        from nltk.stem import WordNetLemmatizer
+        from concurrent.futures import ProcessPoolExecutor
 
-        nltk.download("punkt", quiet=True)
-        nltk.download("stopwords", quiet=True)
-        nltk.download("wordnet", quiet=True)
-        self.stop_words = set(stopwords.words("english"))
-        self.lemmatizer = WordNetLemmatizer()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_packer,
+            initargs=(self.base_dir, compresslevel),
+        ) as executor:
+            # Notebooks are small: batch them to keep the inter-process overhead down
+            chunksize = max(1, min(32, len(jobs) // (4 * workers)))
+            yield from executor.map(_pack_submission, jobs, chunksize=chunksize)
+
+    @property
+    def feature_version(self) -> str:
+        """Version of the extracted features, including the tokenizer and template used."""
+        version = f"{self.FEATURE_VERSION}-{self.tokenizer.name}"
+        if self.template_hashes:
+            version += f"-t{template_digest(self.template_hashes)}"
+        return version
 
     @staticmethod
     def is_ta_version_installed():
+        # NLTK is only needed by the optional "nltk" tokenizer backend
         try:
-            if not is_library_installed("nltk") or not is_library_installed("sklearn"):
-                return False
-
-            return True
+            return is_library_installed("sklearn")
         except ImportError:
             return False
 
     def preprocess_text(self, text):
-        from nltk.tokenize import word_tokenize
+        return " ".join(self.tokenizer.tokenize(text))
 
-        tokens = word_tokenize(text.lower())
-        tokens = [
-            self.lemmatizer.lemmatize(token)
-            for token in tokens
-            if token.isalnum() and token not in self.stop_words
-        ]
-        return " ".join(tokens)
+    def submission_path(self, student_id: str) -> str:
+        return os.path.join(self.base_dir, f"{student_id}-decision_tree_submission.zip")
+
+    def find_submissions(self, location: Optional[str] = None) -> List[str]:
+        """Find submissions in nested folders and LMS export archives under ``location``.
+
+        ``location`` (``base_dir`` by default) is a directory or an export archive; see
+        ``find_submission_sources``. Returns submission names for ``iter_pair_results``.
+        """
+        sources = find_submission_sources(location or self.base_dir)
+        self.sources.update((source.student_id, source) for source in sources)
+        return [source.name for source in sources]
+
+    def submission_source(self, student_id: str) -> SubmissionSource:
+        source = self.sources.get(student_id)
+        if source is None:
+            source = SubmissionSource(student_id, self.submission_path(student_id))
+        return source
+
+    def load_encoded_data(self, student_id: str) -> Dict:
+        with self.profiler.stage("zip_io"):
+            zipf = open_submission(self.submission_source(student_id), self._archives)
+        with zipf:
+            return read_payload(zipf, profiler=self.profiler)
+
+    def extract_features(self, data: Dict) -> Dict:
+        """Reduce an encoded notebook to the inputs used for similarity scoring.
+
+        Cells matching the template are dropped, and a cell already seen in another
+        submission reuses its preprocessed text instead of being tokenized again.
+        """
+        texts = []
+        for cell in data["cells"]:
+            key = cell_hash(cell)
+            if key in self.template_hashes:
+                self.profiler.count("template_cells")
+                continue
+            text = self._cell_terms.get(key)
+            if text is None:
+                if len(self._cell_terms) >= MAX_CELL_TERMS:
+                    self._cell_terms.clear()
+                text = self._cell_terms[key] = self.preprocess_text(cell)
+            else:
+                self.profiler.count("shared_cells")
+            texts.append(text)
+        return {
+            "text": " ".join(texts),
+            "implemented_methods": data["implemented_methods"],
+            "estimations": data["estimations"],
+        }
+
+    def load_submission_features(self, student_id: str) -> Dict:
+        """Return the features of a submission, reusing earlier work when the zip is unchanged.
+
+        Features are memoised per run and, unless caching is disabled, persisted in the
+        feature cache under the SHA-256 of the zip so later runs skip the preprocessing
+        (zips inside an export archive are keyed by their CRC-32 and size instead).
+        """
+        profiler = self.profiler
+        with profiler.stage("hash"):
+            key = f"{self.submission_source(student_id).fingerprint()}-{self.feature_version}"
+        self._feature_keys[student_id] = key
+        if key in self._features:
+            return self._features[key]
+
+        features = None
+        if self.feature_cache is not None:
+            with profiler.stage("cache_read"):
+                features = self.feature_cache.get(key)
+            profiler.count("cache_hits" if features is not None else "cache_misses")
+        if features is None:
+            data = self.load_encoded_data(student_id)
+            with profiler.stage("preprocess"):
+                features = self.extract_features(data)
+            if self.feature_cache is not None:
+                with profiler.stage("cache_write"):
+                    self.feature_cache.put(key, features)
+
+        self._features[key] = features
+        return features
+
+    def prune_memos(self, student_ids: Iterable[str]):
+        """Forget memoised features of submissions that are gone or have changed since.
+
+        A long-running process calls this after each update so memory follows the
+        current cohort rather than every zip version it has ever read.
+        """
+        self._feature_keys = {
+            student_id: self._feature_keys[student_id]
+            for student_id in student_ids
+            if student_id in self._feature_keys
+        }
+        current = set(self._feature_keys.values())
+        self._features = {key: value for key, value in self._features.items() if key in current}
+
+    @staticmethod
+    def method_similarity(methods1: List[str], methods2: List[str]) -> float:
+        longest = max(len(methods1), len(methods2))
+        if longest == 0:
+            return 0.0
+        return len(set(methods1) & set(methods2)) / longest
+
+    @staticmethod
+    def estimation_similarity(
+        estimations1: Dict[str, float], estimations2: Dict[str, float]
+    ) -> float:
+        longest = max(len(estimations1), len(estimations2))
+        if longest == 0:
+            return 0.0
+        estimation_keys = set(estimations1.keys()) & set(estimations2.keys())
+        return sum(abs(estimations1[k] - estimations2[k]) < 1e-6 for k in estimation_keys) / longest
+
+    def score_features(
+        self, features1: Dict, features2: Dict, cell_similarity: float, verbose: bool = True
+    ) -> Tuple[float, Optional[Dict]]:
+        method_similarity = self.method_similarity(
+            features1["implemented_methods"], features2["implemented_methods"]
+        )
+        estimation_similarity = self.estimation_similarity(
+            features1["estimations"], features2["estimations"]
+        )
+        overall_similarity = (cell_similarity + method_similarity + estimation_similarity) / 3
+        if not verbose:
+            return overall_similarity, None
+
+        return overall_similarity, self.pair_details(
+            features1,
+            features2,
+            cell_similarity,
+            method_similarity,
+            estimation_similarity,
+            overall_similarity,
+        )
+
+    @staticmethod
+    def pair_details(
+        features1: Dict,
+        features2: Dict,
+        cell_similarity: float,
+        method_similarity: float,
+        estimation_similarity: float,
+        overall_similarity: float,
+    ) -> Dict:
+        methods1 = set(features1["implemented_methods"])
+        methods2 = set(features2["implemented_methods"])
+        estimations1 = features1["estimations"]
+        estimations2 = features2["estimations"]
+
+        # Sorted so the report does not depend on each process's string hash seed
+        estimation_keys = sorted(set(estimations1.keys()) & set(estimations2.keys()))
+        return {
+            "cell_similarity": cell_similarity,
+            "method_similarity": method_similarity,
+            "estimation_similarity": estimation_similarity,
+            "overall_similarity": overall_similarity,
+            "common_methods": sorted(methods1 & methods2),
+            "unique_methods_1": sorted(methods1 - methods2),
+            "unique_methods_2": sorted(methods2 - methods1),
+            "common_estimations": {k: (estimations1[k], estimations2[k]) for k in estimation_keys},
+        }
 
     def compare_submissions(self, student_id1: str, student_id2: str) -> Tuple[float, Dict]:
         if not self.is_ta_version_installed():
@@ -82,93 +386,783 @@ class DecisionTreeSubmission(BaseAuthenticator):
         from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.metrics.pairwise import cosine_similarity
 
-        def load_encoded_data(student_id):
-            zip_path = os.path.join(self.base_dir, f"{student_id}-decision_tree_submission.zip")
-            with zipfile.ZipFile(zip_path, "r") as zipf:
-                with zipf.open("encoded_notebook.json") as f:
-                    return json.load(f)
-
-        data1 = load_encoded_data(student_id1)
-        data2 = load_encoded_data(student_id2)
+        features1 = self.load_submission_features(student_id1)
+        features2 = self.load_submission_features(student_id2)
 
         # Cell similarity using NLP
-        cells1 = " ".join([self.preprocess_text(cell) for cell in data1["encoded_cells"]])
-        cells2 = " ".join([self.preprocess_text(cell) for cell in data2["encoded_cells"]])
         vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform([cells1, cells2])
-        cell_similarity = cosine_similarity(tfidf_matrix[0], tfidf_matrix[1])[0][0]
-
-        # Method similarity
-        method_similarity = len(
-            set(data1["implemented_methods"]) & set(data2["implemented_methods"])
-        ) / max(len(data1["implemented_methods"]), len(data2["implemented_methods"]))
+        tfidf_matrix = vectorizer.fit_transform([features1["text"], features2["text"]])
+        cell_similarity = float(cosine_similarity(tfidf_matrix[0], tfidf_matrix[1])[0][0])
 
-        # Estimation similarity
-        estimation_keys = set(data1["estimations"].keys()) & set(data2["estimations"].keys())
-        estimation_similarity = sum(
-            abs(data1["estimations"][k] - data2["estimations"][k]) < 1e-6 for k in estimation_keys
-        ) / max(len(data1["estimations"]), len(data2["estimations"]))
+        return self.score_features(features1, features2, cell_similarity)
 
-        overall_similarity = (cell_similarity + method_similarity + estimation_similarity) / 3
+    def cohort_matrices(
+        self, features: List[Dict], tfidf_model: Optional[Dict] = None
+    ) -> "CohortMatrices":
+        """Fit one TF-IDF model over the whole cohort and build the matrices used to score it.
 
-        verbose_result = {
-            "cell_similarity": cell_similarity,
-            "method_similarity": method_similarity,
-            "estimation_similarity": estimation_similarity,
-            "overall_similarity": overall_similarity,
-            "common_methods": list(
-                set(data1["implemented_methods"]) & set(data2["implemented_methods"])
-            ),
-            "unique_methods_1": list(
-                set(data1["implemented_methods"]) - set(data2["implemented_methods"])
-            ),
-            "unique_methods_2": list(
-                set(data2["implemented_methods"]) - set(data1["implemented_methods"])
-            ),
-            "common_estimations": {
-                k: (data1["estimations"][k], data2["estimations"][k]) for k in estimation_keys
-            },
-        }
+        Cell, method and estimation similarity for any block of pairs then come from sparse
+        matrix products instead of per-pair Python work. A ``tfidf_model`` from
+        ``fit_tfidf_model`` (such as the similarity index's) is used instead of fitting one.
+        """
+        from .cohort import CohortMatrices
 
-        return overall_similarity, verbose_result
+        with self.profiler.stage("imports"):
+            _import_scoring_dependencies()
+        texts = [f["text"] for f in features]
+        model = tfidf_model
+        if model is None:
+            with self.profiler.stage("tfidf_fit"):
+                model = self.fit_tfidf_model(texts)
+        with self.profiler.stage("tfidf_transform"):
+            tfidf = self.transform_tfidf(model, texts)
+        with self.profiler.stage("cohort_matrices"):
+            return CohortMatrices(tfidf, features)
 
     def check_required_methods(
         self, student_id: str, required_methods: List[str]
     ) -> Dict[str, bool]:
-        zip_path = os.path.join(self.base_dir, f"{student_id}-decision_tree_submission.zip")
-        with zipfile.ZipFile(zip_path, "r") as zipf:
-            with zipf.open("encoded_notebook.json") as f:
-                data = json.load(f)
+        data = self.load_encoded_data(student_id)
 
         implemented = set(data["implemented_methods"])
         return {method: method in implemented for method in required_methods}
 
+    def load_all_features(
+        self,
+        student_ids: List[str],
+        workers: int = 1,
+        progress_callback: Optional[Callable[[], None]] = None,
+    ) -> List[Dict]:
+        """Load the features of every submission, preserving the order of ``student_ids``."""
+        if workers <= 1:
+            features = []
+            for student_id in student_ids:
+                features.append(self.load_submission_features(student_id))
+                if progress_callback is not None:
+                    progress_callback()
+            return features
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        features = [None] * len(student_ids)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_loader,
+            initargs=(
+                self.base_dir,
+                self.feature_cache,
+                self.tokenizer.name,
+                self.sources,
+                self.template_hashes,
+            ),
+        ) as executor:
+            futures = {
+                executor.submit(_load_features, student_id): index
+                for index, student_id in enumerate(student_ids)
+            }
+            for future in as_completed(futures):
+                features[futures[future]] = future.result()
+                if progress_callback is not None:
+                    progress_callback()
+        return features
+
+    def score_rows(
+        self,
+        student_ids: List[str],
+        features: List[Dict],
+        cohort: "CohortMatrices",
+        start: int,
+        stop: int,
+        candidates: Optional[Dict[int, List[int]]] = None,
+        verbose: bool = True,
+        min_similarity: Optional[float] = None,
+        similarity_out=None,
+    ) -> Tuple[List[Tuple[str, str, float, Optional[Dict]]], int, int]:
+        """Score every pair ``(i, j)`` with ``start <= i < stop`` and ``j > i``.
+
+        When ``candidates`` is given only the listed partners ``j`` of each row are scored.
+        Scores for the whole block come from ``cohort``; the per-pair detail dictionaries
+        are only built when ``verbose`` is set. Pairs below ``min_similarity`` are dropped.
+        ``similarity_out`` (an ``n x n`` array, e.g. a memmap) receives the overall
+        similarity of the full rows ``start..stop``.
+
+        Returns ``(results, pairs_scored, potential_cheating)``: the two counts cover every
+        scored pair, including those dropped by ``min_similarity``.
+        """
+        import numpy as np
+
+        n = len(student_ids)
+        scored = []
+        pairs_scored = potential_cheating = 0
+        if candidates is None:
+            # Only columns right of the block are needed unless the full rows are kept
+            first = 0 if similarity_out is not None else start + 1
+            block = cohort.block(slice(start, stop), None if first == 0 else slice(first, n))
+            if similarity_out is not None:
+                similarity_out[start:stop] = block[3]
+        for i in range(start, stop):
+            if candidates is None:
+                partners = np.arange(i + 1, n)
+                row_scores = tuple(scores[i - start, i + 1 - first :] for scores in block)
+            else:
+                partners = np.asarray(candidates.get(i, []), dtype=np.intp)
+                if not len(partners):
+                    continue
+                row_scores = tuple(scores[0] for scores in cohort.block([i], partners))
+            pairs_scored += len(partners)
+            potential_cheating += int(np.count_nonzero(row_scores[3] > self.cheating_threshold))
+            if min_similarity is not None:
+                keep = row_scores[3] >= min_similarity
+                partners = partners[keep]
+                row_scores = tuple(scores[keep] for scores in row_scores)
+
+            for k, j in enumerate(partners.tolist()):
+                similarity = float(row_scores[3][k])
+                verbose_result = None
+                if verbose:
+                    verbose_result = self.pair_details(
+                        features[i],
+                        features[j],
+                        *(float(scores[k]) for scores in row_scores),
+                    )
+                scored.append((student_ids[i], student_ids[j], similarity, verbose_result))
+        return scored, pairs_scored, potential_cheating
+
+    def score_top_k(
+        self,
+        cohort: "CohortMatrices",
+        start: int,
+        stop: int,
+        k: int,
+        min_similarity: Optional[float] = None,
+        similarity_out=None,
+    ) -> Tuple:
+        """Find the ``k`` most similar partners of each row in ``[start, stop)``.
+
+        Returns ``((partners, cell, method, estimation, overall), pairs_scored,
+        potential_cheating)``. The arrays have shape ``(stop - start, k)``; slots without a
+        partner (fewer than ``k`` other submissions, or the rest below ``min_similarity``)
+        have partner ``-1``. The counts cover every pair ``(i, j)`` with ``j > i`` in the
+        block, like ``score_rows``.
+        """
+        import numpy as np
+
+        scores = cohort.block(slice(start, stop))
+        if similarity_out is not None:
+            similarity_out[start:stop] = scores[3]
+        upper = np.arange(scores[3].shape[1])[None, :] > np.arange(start, stop)[:, None]
+        pairs_scored = int(np.count_nonzero(upper))
+        potential_cheating = int(np.count_nonzero(upper & (scores[3] > self.cheating_threshold)))
+        ranked = scores[3].copy()
+        rows = np.arange(stop - start)
+        ranked[rows, rows + start] = -np.inf
+        if min_similarity is not None:
+            ranked[ranked < min_similarity] = -np.inf
+        k = min(k, ranked.shape[1])
+        top = np.argpartition(-ranked, k - 1, axis=1)[:, :k]
+        partners = np.where(np.isfinite(np.take_along_axis(ranked, top, axis=1)), top, -1)
+        top_scores = (partners,) + tuple(np.take_along_axis(s, top, axis=1) for s in scores)
+        return top_scores, pairs_scored, potential_cheating
+
+    def nearest(
+        self,
+        student_id: str,
+        k: int = 10,
+        submissions: Optional[List[str]] = None,
+        workers: int = 1,
+        tfidf_model: Optional[Dict] = None,
+    ) -> List[Dict]:
+        """Return the ``k`` submissions most similar to ``student_id``, most similar first.
+
+        ``submissions`` defaults to everything ``find_submissions`` sees in ``base_dir``.
+        The cohort matrices are built once and reused by later queries while every zip
+        has the same fingerprint and ``tfidf_model`` (see ``cohort_matrices``) is the same
+        object; each query scores one row against them, so it is linear in the cohort size.
+        Zips whose mtime and size are unchanged since the last query are not hashed again.
+        """
+        if not self.is_ta_version_installed():
+            raise ImportError(
+                "TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature."
+            )
+        import numpy as np
+
+        if submissions is None:
+            submissions = self.find_submissions()
+        student_ids = [sub.split("-")[0] for sub in submissions]
+        if student_id not in student_ids:
+            raise ValueError(f"No submission found for student {student_id}")
+
+        cached = self._nearest_cohort
+        known = {} if cached is None else dict(cached[0])
+        fingerprints = []
+        for sid in student_ids:
+            source = self.submission_source(sid)
+            state = source.state()
+            if sid in known and known[sid][0] == state:
+                # Unchanged mtime and size: skip hashing the zip again
+                fingerprints.append((sid, known[sid]))
+            else:
+                fingerprints.append((sid, (state, source.fingerprint())))
+        if (
+            cached is None
+            or [(sid, fp) for sid, (_, fp) in cached[0]]
+            != [(sid, fp) for sid, (_, fp) in fingerprints]
+            or cached[1] is not tfidf_model
+        ):
+            features = self.load_all_features(student_ids, workers)
+            cohort = self.cohort_matrices(features, tfidf_model)
+        else:
+            cohort = cached[2]
+        self._nearest_cohort = (fingerprints, tfidf_model, cohort)
+
+        row = student_ids.index(student_id)
+        partners, cell, method, estimation, overall = (
+            scores[0] for scores in self.score_top_k(cohort, row, row + 1, k)[0]
+        )
+        # Most similar first, ties in cohort order
+        order = np.lexsort((partners, -overall))
+        return [
+            {
+                "student_id": student_ids[partners[i]],
+                "similarity": float(overall[i]),
+                "cell_similarity": float(cell[i]),
+                "method_similarity": float(method[i]),
+                "estimation_similarity": float(estimation[i]),
+                "potential_cheating": self.is_potential_cheating(float(overall[i])),
+            }
+            for i in order.tolist()
+            if partners[i] >= 0
+        ]
+
+    def _iter_top_k_pairs(
+        self, student_ids: List[str], features: List[Dict], blocks: List[Tuple], verbose: bool
+    ) -> Iterator[Tuple[str, str, float, Optional[Dict]]]:
+        """Yield the union of every row's top-k partners once per pair, in row-major order."""
+        import numpy as np
+
+        if not blocks:
+            return
+        partners, *scores = (np.concatenate(arrays) for arrays in zip(*blocks))
+        rows = np.repeat(np.arange(len(partners)), partners.shape[1])
+        partners = partners.ravel()
+        valid = partners >= 0
+        first = np.minimum(rows, partners)[valid]
+        second = np.maximum(rows, partners)[valid]
+        scores = [s.ravel()[valid] for s in scores]
+
+        previous = None
+        for position in np.lexsort((second, first)).tolist():
+            i, j = int(first[position]), int(second[position])
+            if (i, j) == previous:
+                continue
+            previous = (i, j)
+            pair_scores = [float(s[position]) for s in scores]
+            verbose_result = None
+            if verbose:
+                verbose_result = self.pair_details(features[i], features[j], *pair_scores)
+            yield student_ids[i], student_ids[j], pair_scores[3], verbose_result
+
+    def is_potential_cheating(self, similarity: float) -> bool:
+        return similarity > self.cheating_threshold
+
+    def should_ignore_cheating(self, potential_cheating_count: int, total_comparisons: int) -> bool:
+        cheating_percentage = (
+            potential_cheating_count / total_comparisons if total_comparisons > 0 else 0
+        )
+        return cheating_percentage > self.ignore_cheating_percentage
+
+    def iter_pair_results(
+        self,
+        submissions: List[str],
+        progress_callback: Optional[Callable[[], None]] = None,
+        workers: int = 1,
+        lsh: Optional["MinHashLSH"] = None,
+        verbose: bool = True,
+        min_similarity: Optional[float] = None,
+        top_k: Optional[int] = None,
+        similarity_path: Optional[str] = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        stats: Optional[Dict[str, int]] = None,
+    ) -> Iterator[Tuple[str, str, float, Optional[Dict]]]:
+        """Yield ``(student_id1, student_id2, similarity, verbose_result)`` for each pair.
+
+        Pairs are produced row by row as they are scored, so callers can write them out
+        without holding every result in memory. ``verbose_result`` is ``None`` unless
+        ``verbose`` is set.
+
+        ``progress_callback`` is called once per loaded submission and once per scored
+        row, i.e. ``2 * len(submissions)`` times. With ``workers > 1`` loading and scoring
+        run in process pools; pairs come out in the same order for any worker count.
+
+        Passing a ``MinHashLSH`` switches to approximate mode: only the candidate pairs
+        produced by LSH banding over the preprocessed cell tokens are scored.
+
+        Scoring runs over row blocks sized so their working arrays stay within roughly
+        ``memory_limit`` bytes, whatever the cohort size. To keep the output small too,
+        only pairs at or above ``min_similarity`` are yielded and, with ``top_k``, only
+        pairs where one student is among the other's ``top_k`` most similar.
+        ``similarity_path`` additionally writes the full ``n x n`` overall similarity
+        matrix (float32, in ``student_ids`` order) to a memory-mapped ``.npy`` file.
+
+        Once the generator is exhausted, ``stats`` (if given) holds ``pairs_scored`` and
+        ``potential_cheating`` over every scored pair, reported or not, and ``total_pairs``,
+        the ``n * (n - 1) / 2`` pairs of the cohort. The cheating rate is computed over
+        ``total_pairs``: pairs LSH never scored count as not cheating.
+        """
+        if not self.is_ta_version_installed():
+            raise ImportError(
+                "TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature."
+            )
+        if lsh is not None and (top_k is not None or similarity_path is not None):
+            raise ValueError("top_k and similarity_path need every pair scored; drop lsh")
+
+        profiler = self.profiler
+        student_ids = [sub.split("-")[0] for sub in submissions]
+        profiler.count("submissions", len(student_ids))
+        with profiler.stage("load_features"):
+            features = self.load_all_features(student_ids, workers, progress_callback)
+        cohort = self.cohort_matrices(features)
+
+        candidates = None
+        if lsh is not None:
+            with profiler.stage("lsh"):
+                candidates = {}
+                signatures = lsh.signatures(f["text"] for f in features)
+                for i, j in sorted(lsh.candidate_pairs(signatures)):
+                    candidates.setdefault(i, []).append(j)
+
+        import numpy as np
+
+        n = len(student_ids)
+        options = {"min_similarity": min_similarity, "top_k": top_k, "similarity_path": None}
+        similarity_out = None
+        if similarity_path is not None:
+            similarity_out = np.lib.format.open_memmap(
+                similarity_path, mode="w+", dtype=np.float32, shape=(n, n)
+            )
+            options["similarity_path"] = similarity_path
+
+        bytes_per_score = _BYTES_PER_SCORE
+        if top_k is None and min_similarity is None:
+            # Every scored pair is also returned as a result
+            bytes_per_score += _BYTES_PER_VERBOSE_RESULT if verbose else _BYTES_PER_RESULT
+        # Workers each hold a block and the parent holds up to 2 * workers finished ones
+        blocks_in_memory = 1 if workers <= 1 else 3 * workers
+        blocks = _row_blocks(
+            n,
+            max(1, memory_limit // (bytes_per_score * blocks_in_memory)),
+            full_rows=top_k is not None or similarity_path is not None,
+            min_blocks=1 if workers <= 1 else workers * 4,
+        )
+
+        def score_block(start: int, stop: int):
+            if top_k is not None:
+                return self.score_top_k(cohort, start, stop, top_k, min_similarity, similarity_out)
+            return self.score_rows(
+                student_ids,
+                features,
+                cohort,
+                start,
+                stop,
+                candidates,
+                verbose,
+                min_similarity,
+                similarity_out,
+            )
+
+        if stats is None:
+            stats = {}
+        stats.update(pairs_scored=0, potential_cheating=0, total_pairs=n * (n - 1) // 2)
+        top_k_blocks = []
+        with contextlib.ExitStack() as stack:
+            if workers <= 1:
+                scored_blocks = (score_block(start, stop) for start, stop in blocks)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(
+                        max_workers=workers,
+                        initializer=_init_scorer,
+                        initargs=(
+                            self.base_dir,
+                            student_ids,
+                            features,
+                            cohort,
+                            candidates,
+                            verbose,
+                            options,
+                            (self.cheating_threshold, self.ignore_cheating_percentage),
+                        ),
+                    )
+                )
+                # Keep only a few blocks in flight so finished results never pile up unconsumed
+                scored_blocks = _ordered_map(executor, _score_rows, blocks, window=workers * 2)
+
+            for start, stop in blocks:
+                # Never keep a stage open across the yield (see StageProfiler); with workers
+                # the time spent here is the wait for them, not their CPU time
+                with profiler.stage("score"):
+                    scored, pairs_scored, potential_cheating = next(scored_blocks)
+                profiler.count("pairs_scored", pairs_scored)
+                stats["pairs_scored"] += pairs_scored
+                stats["potential_cheating"] += potential_cheating
+                if top_k is None:
+                    yield from scored
+                else:
+                    top_k_blocks.append(scored)
+                if progress_callback is not None:
+                    for _ in range(stop - start):
+                        progress_callback()
+
+        if similarity_out is not None:
+            similarity_out.flush()
+        yield from self._iter_top_k_pairs(student_ids, features, top_k_blocks, verbose)
+
     def analyze_all_submissions(
-        self, submissions: List[str]
+        self,
+        submissions: List[str],
+        progress_callback: Optional[Callable[[], None]] = None,
+        workers: int = 1,
+        lsh: Optional["MinHashLSH"] = None,
     ) -> Tuple[List[Tuple[str, str, float]], Dict[str, Dict], bool]:
+        """Compare every pair of submissions and collect the results in memory.
+
+        See ``iter_pair_results`` for the arguments; prefer it for large cohorts.
+        """
         results = []
         verbose_results = {}
         potential_cheating_count = 0
 
-        for i, sub1 in enumerate(submissions):
-            for sub2 in submissions[i + 1 :]:
-                student_id1 = sub1.split("-")[0]
-                student_id2 = sub2.split("-")[0]
-                similarity, verbose_result = self.compare_submissions(student_id1, student_id2)
-                results.append((student_id1, student_id2, similarity))
-                verbose_results[f"{student_id1}-{student_id2}"] = verbose_result
+        for student_id1, student_id2, similarity, verbose_result in self.iter_pair_results(
+            submissions, progress_callback, workers, lsh
+        ):
+            results.append((student_id1, student_id2, similarity))
+            verbose_results[f"{student_id1}-{student_id2}"] = verbose_result
 
-                if similarity > self.cheating_threshold:
-                    potential_cheating_count += 1
+            if self.is_potential_cheating(similarity):
+                potential_cheating_count += 1
 
-        total_comparisons = len(results)
-        cheating_percentage = (
-            potential_cheating_count / total_comparisons if total_comparisons > 0 else 0
-        )
-        ignore_cheating = cheating_percentage > self.ignore_cheating_percentage
+        ignore_cheating = self.should_ignore_cheating(potential_cheating_count, len(results))
 
         return results, verbose_results, ignore_cheating
 
+    @staticmethod
+    def fit_tfidf_model(texts: List[str]) -> Dict:
+        """Fit TF-IDF on ``texts`` and return its vocabulary and IDF weights as plain data."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer()
+        try:
+            vectorizer.fit(texts)
+        except ValueError:
+            # Every document is empty after preprocessing
+            return {"vocabulary": {}, "idf": []}
+        return {
+            "vocabulary": {term: int(column) for term, column in vectorizer.vocabulary_.items()},
+            "idf": vectorizer.idf_.tolist(),
+        }
+
+    @staticmethod
+    def transform_tfidf(model: Dict, texts: List[str]):
+        """Apply a model from ``fit_tfidf_model``; rows are L2-normalised like TfidfVectorizer."""
+        from scipy.sparse import csr_matrix, diags
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.preprocessing import normalize
+
+        if not model or not model["vocabulary"]:
+            return csr_matrix((len(texts), 1))
+        counts = CountVectorizer(vocabulary=model["vocabulary"]).transform(texts)
+        return normalize(counts @ diags(model["idf"]), norm="l2").tocsr()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.base_dir, INDEX_FILE_NAME)
+
+    def refresh_index(
+        self, submissions: List[str], workers: int = 1, rebuild: bool = False
+    ) -> Dict[str, int]:
+        """Bring the similarity index in ``base_dir`` in line with ``submissions``.
+
+        Zips whose mtime and size are unchanged are skipped without hashing; otherwise the
+        SHA-256 decides whether the features must be reloaded. New or changed submissions
+        lose their stored pairs and are left pending for ``score_index``.
+
+        The TF-IDF model is fitted when the index first has text and then kept frozen so
+        stored cell similarities stay valid as submissions arrive. It is refitted, and
+        every pair rescored, when more than ``REFIT_UNSEEN_TERMS`` of the distinct terms
+        in the new submissions are missing from its vocabulary, or on ``rebuild=True``.
+        """
+        if not self.is_ta_version_installed():
+            raise ImportError(
+                "TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature."
+            )
+
+        with SimilarityIndex(self.index_path) as index:
+            if rebuild or index.get_meta("feature_version") != self.feature_version:
+                index.clear()
+                index.set_meta("feature_version", self.feature_version)
+                index.set_meta("tfidf_model", None)
+
+            student_ids = [sub.split("-")[0] for sub in submissions]
+            states = index.submission_states()
+            removed = set(states) - set(student_ids)
+            index.remove_submissions(removed)
+
+            changed = []
+            for student_id in student_ids:
+                source = self.submission_source(student_id)
+                mtime, size = source.state()
+                state = states.get(student_id)
+                if state is not None and state[:2] == (mtime, size):
+                    continue
+                sha256 = source.fingerprint()
+                if state is not None and state[2] == sha256:
+                    index.touch_submission(student_id, mtime, size)
+                    continue
+                changed.append((student_id, (mtime, size), sha256))
+
+            with self.profiler.stage("load_features"):
+                features = self.load_all_features(
+                    [student_id for student_id, _, _ in changed], workers
+                )
+            for (student_id, (mtime, size), sha256), submission_features in zip(changed, features):
+                index.put_submission(student_id, mtime, size, sha256, submission_features)
+
+            with self.profiler.stage("imports"):
+                _import_scoring_dependencies()
+            model = index.get_meta("tfidf_model")
+            new_texts = [f["text"] for f in features]
+            if model is None or _unseen_terms(model, new_texts) > REFIT_UNSEEN_TERMS:
+                texts = [f["text"] for f in index.features().values()]
+                with self.profiler.stage("tfidf_fit"):
+                    model = self.fit_tfidf_model(texts)
+                # An empty vocabulary scores every pair 0; fit again once there is text
+                index.set_meta("tfidf_model", model if model["vocabulary"] else None)
+                index.reset_scores()
+            index.commit()
+
+            return {
+                "changed": len(changed),
+                "removed": len(removed),
+                "pending": len(index.student_ids(complete=False)),
+            }
+
+    def score_index(self, progress_callback: Optional[Callable[[], None]] = None) -> int:
+        """Score every pending submission in the index against the complete ones.
+
+        Each submission is committed as soon as its pairs are stored, so an interrupted
+        run resumes from the first submission that was not finished. Returns the number
+        of submissions scored; ``progress_callback`` is called once per submission.
+        """
+        from .cohort import CohortMatrices
+
+        profiler = self.profiler
+        with SimilarityIndex(self.index_path) as index:
+            features = index.features()
+            complete = index.student_ids(complete=True)
+            pending = index.student_ids(complete=False)
+            student_ids = complete + pending
+            ordered_features = [features[sid] for sid in student_ids]
+            with profiler.stage("tfidf_transform"):
+                tfidf = self.transform_tfidf(
+                    index.get_meta("tfidf_model"), [f["text"] for f in ordered_features]
+                )
+            with profiler.stage("cohort_matrices"):
+                cohort = CohortMatrices(tfidf, ordered_features)
+
+            for offset, student_id in enumerate(pending):
+                row = len(complete) + offset
+                with profiler.stage("score"):
+                    cell, _, _, overall = (
+                        scores[0] for scores in cohort.block([row], slice(0, row))
+                    )
+                    pairs = []
+                    for other_row in range(row):
+                        student_id1, student_id2 = sorted((student_id, student_ids[other_row]))
+                        pairs.append(
+                            (
+                                student_id1,
+                                student_id2,
+                                float(cell[other_row]),
+                                float(overall[other_row]),
+                            )
+                        )
+                profiler.count("pairs_scored", len(pairs))
+                with profiler.stage("index_write"):
+                    index.complete_submission(student_id, pairs)
+                if progress_callback is not None:
+                    progress_callback()
+
+            return len(pending)
+
+    def iter_indexed_pairs(
+        self, verbose: bool = True
+    ) -> Iterator[Tuple[str, str, float, Optional[Dict]]]:
+        """Yield the stored pairs of the index in the same shape as ``iter_pair_results``."""
+        with SimilarityIndex(self.index_path) as index:
+            features = index.features() if verbose else None
+            for student_id1, student_id2, cell_similarity, similarity in index.iter_pairs():
+                verbose_result = None
+                if verbose:
+                    _, verbose_result = self.score_features(
+                        features[student_id1], features[student_id2], cell_similarity
+                    )
+                yield student_id1, student_id2, similarity, verbose_result
+
+
+def _import_scoring_dependencies():
+    """Import the scientific stack up front, so its first import is not timed as a stage."""
+    import numpy  # noqa: F401
+    import scipy.sparse  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+
+def _unseen_terms(model: Dict, texts: List[str]) -> float:
+    """Fraction of the distinct terms in ``texts`` that are not in the model's vocabulary."""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    analyze = CountVectorizer().build_analyzer()
+    terms = {term for text in texts for term in analyze(text)}
+    if not terms:
+        return 0.0
+    return len(terms - model["vocabulary"].keys()) / len(terms)
+
+
+# Approximate bytes per scored pair: the dense score arrays of a block plus the sparse
+# products and temporaries they are built from, and the result tuples when every pair
+# of a block is returned
+_BYTES_PER_SCORE = 96
+_BYTES_PER_RESULT = 160
+_BYTES_PER_VERBOSE_RESULT = 2048
+
+
+def _row_blocks(
+    n: int, max_cells: int, full_rows: bool = False, min_blocks: int = 1
+) -> List[Tuple[int, int]]:
+    """Split rows ``0..n`` into contiguous blocks of at most ``max_cells`` scores each.
+
+    A block ``[start, stop)`` is scored against the columns right of ``start`` (every
+    column with ``full_rows``), so later blocks hold more rows. ``min_blocks`` keeps
+    enough blocks around to spread over a worker pool.
+    """
+    total = n * n if full_rows else n * (n - 1) // 2
+    target = max(1, min(max_cells, total // max(1, min_blocks)))
+    blocks = []
+    start = 0
+    while start < n:
+        width = n if full_rows else max(1, n - start - 1)
+        stop = min(n, start + max(1, target // width))
+        blocks.append((start, stop))
+        start = stop
+    return blocks
+
+
+def _ordered_map(executor, fn, items, window: int):
+    """Like ``executor.map`` but with at most ``window`` tasks submitted ahead of the consumer."""
+    from collections import deque
+
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# Per-process state for the worker pools used by analyze_all_submissions. Each worker
+# builds its authenticator (and prepares its tokenizer) once instead of once per task.
+_worker_state = {}
+
+
+def _init_loader(
+    base_dir: str,
+    feature_cache: Optional[FeatureCache],
+    tokenizer: str,
+    sources: Dict[str, SubmissionSource],
+    template_hashes: FrozenSet[str],
+):
+    authenticator = DecisionTreeSubmission(base_dir, use_cache=False, tokenizer=tokenizer)
+    authenticator.feature_cache = feature_cache
+    authenticator.sources = sources
+    authenticator.template_hashes = template_hashes
+    authenticator.tokenizer.prepare()
+    _worker_state["authenticator"] = authenticator
+
+
+def _load_features(student_id: str) -> Dict:
+    return _worker_state["authenticator"].load_submission_features(student_id)
+
+
+def _init_scorer(
+    base_dir: str, student_ids, features, cohort, candidates, verbose, options, thresholds
+):
+    authenticator = DecisionTreeSubmission(base_dir, use_cache=False)
+    # Workers count flagged pairs, so they must use the parent's thresholds, not the defaults
+    authenticator.cheating_threshold, authenticator.ignore_cheating_percentage = thresholds
+    _worker_state["authenticator"] = authenticator
+    _worker_state["scoring_inputs"] = (student_ids, features, cohort)
+    _worker_state["candidates"] = candidates
+    _worker_state["verbose"] = verbose
+    _worker_state["options"] = options
+    _worker_state["similarity_out"] = None
+    if options["similarity_path"] is not None:
+        import numpy as np
+
+        # Blocks cover disjoint rows, so workers can write the shared file directly
+        _worker_state["similarity_out"] = np.load(options["similarity_path"], mmap_mode="r+")
+
+
+def _score_rows(block: Tuple[int, int]):
+    start, stop = block
+    authenticator = _worker_state["authenticator"]
+    student_ids, features, cohort = _worker_state["scoring_inputs"]
+    options = _worker_state["options"]
+    similarity_out = _worker_state["similarity_out"]
+    if options["top_k"] is not None:
+        scored = authenticator.score_top_k(
+            cohort, start, stop, options["top_k"], options["min_similarity"], similarity_out
+        )
+    else:
+        scored = authenticator.score_rows(
+            student_ids,
+            features,
+            cohort,
+            start,
+            stop,
+            _worker_state["candidates"],
+            _worker_state["verbose"],
+            options["min_similarity"],
+            similarity_out,
+        )
+    if similarity_out is not None:
+        similarity_out.flush()
+    return scored
+
+
+def _init_packer(base_dir: str, compresslevel: Optional[int]):
+    _worker_state["packer"] = (DecisionTreeSubmission(base_dir, use_cache=False), compresslevel)
+
+
+def _pack_submission(job: Tuple[str, str, Optional[str], str]):
+    return _pack_with(*_worker_state["packer"], job)
+
+
+def _pack_with(
+    authenticator, compresslevel: Optional[int], job: Tuple[str, str, Optional[str], str]
+):
+    student_id, notebook_path, decision_tree_path, zip_path = job
+    try:
+        extra_files = [("decision_tree.py", decision_tree_path)] if decision_tree_path else []
+        size = authenticator.write_submission_zip(
+            notebook_path, zip_path, compresslevel, extra_files
+        )
+    except (OSError, ValueError, KeyError) as e:
+        return student_id, None, 0, f"{type(e).__name__}: {e}"
+    return student_id, zip_path, size, None
+
 
 def submit_notebook(student_id: str, notebook_path: str = "./main.ipynb"):
     authenticator = DecisionTreeSubmission()
@@ -1,12 +1,10 @@
-import base64
 import importlib.util
-import json
+import io
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Optional
 
-import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from .notebook_reader import iter_notebook_cells
+from .predictions import write_predictions_csv
 
 
 class BaseAuthenticator:
@@ -15,19 +13,24 @@ class BaseAuthenticator:
         os.makedirs(self.base_dir, exist_ok=True)
 
     def encode_notebook(self, notebook_path: str) -> Dict[str, Any]:
-        with open(notebook_path, "r") as f:
-            nb = json.load(f)
+        with open(notebook_path, "r", encoding="utf-8") as f:
+            # Stream the cells so embedded outputs (e.g. large plots) are skipped, not parsed
+            return self._encode_cells(iter_notebook_cells(f))
 
-        encoded_cells = []
+    def encode_notebook_content(self, content: bytes) -> Dict[str, Any]:
+        """Like ``encode_notebook``, for a notebook already read into memory."""
+        return self._encode_cells(iter_notebook_cells(io.StringIO(content.decode("utf-8"))))
+
+    @staticmethod
+    def _encode_cells(notebook_cells: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        cells = []
         implemented_methods = []
         estimations = {}
-        decoded_cells = []
 
-        for cell in nb["cells"]:
+        for cell in notebook_cells:
             if cell["cell_type"] == "code":
                 cell_content = "".join(cell["source"])
-                encoded_cell = base64.b64encode(cell_content.encode()).decode()
-                encoded_cells.append(encoded_cell)
+                cells.append(cell_content)
 
                 methods = [
                     line.strip()
@@ -41,35 +44,20 @@ class BaseAuthenticator:
                         key, value = line.split("# Estimation:")[-1].split(":")
                         estimations[key.strip()] = float(value.strip())
 
-                # Decode the cell content using TF-IDF
-                decoded_cell = self.decode_cell_with_tfidf(cell_content)
-                decoded_cells.append(
-                    decoded_cell.tolist() if isinstance(decoded_cell, np.ndarray) else decoded_cell
-                )
-
         return {
-            "encoded_cells": encoded_cells,
-            "decoded_cells": decoded_cells,
+            "cells": cells,
             "implemented_methods": implemented_methods,
             "estimations": estimations,
         }
 
-    def decode_cell_with_tfidf(self, cell_content: str) -> str:
-        # Assuming there's a method to decode the cell content using TF-IDF
-        # This is a placeholder for the actual decoding logic
-
-        # Assuming there's a method to decode the cell content using TF-IDF
-        # This is a placeholder for the actual decoding logic
-        vectorizer = TfidfVectorizer()
-        vectorizer.fit_transform([cell_content])
-        decoded_cell = vectorizer.transform([cell_content]).toarray()[0]
-        return decoded_cell
-
-    def create_submission_csv(self, predictions: List):
-        df = pd.DataFrame()
-        df["id"] = list(range(1, len(predictions) + 1))
-        df["prediction"] = predictions
-        df.to_csv("./submission.csv", index=False)
+    def create_submission_csv(
+        self,
+        predictions: Iterable,
+        path: str = "./submission.csv",
+        compress: Optional[bool] = None,
+    ) -> int:
+        """Write ``id,prediction`` rows; see ``predictions.write_predictions_csv``."""
+        return write_predictions_csv(predictions, path, compress)
 
 
 def is_library_installed(library_name):
@@ -1,11 +1,15 @@
 import csv
 import json
 import os
-import pkgutil
+import signal
+import sys
 
 import click
 
-from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission, submit_notebook
+from iust_ai_toolkit.feature_cache import CACHE_DIR_NAME, DEFAULT_MAX_SIZE, FeatureCache
+from iust_ai_toolkit.profiling import StageProfiler
+from iust_ai_toolkit.registry import course_names, find_project, get_course
+from iust_ai_toolkit.tokenizers import DEFAULT_TOKENIZER, TOKENIZERS
 
 
 @click.group()
@@ -14,12 +18,17 @@ def main():
     pass
 
 
+def _authenticator_class(project: str = "decision-tree"):
+    """Import the authenticator of ``project`` only once a command needs it."""
+    assignment = find_project(project)
+    return assignment.load(assignment.authenticator)
+
+
 @main.command()
 def list_courses():
     """List available courses (modules) in the IUST AI Toolkit."""
-    courses = [name for _, name, is_pkg in pkgutil.iter_modules(["iust_ai_toolkit"]) if is_pkg]
     click.echo("Available Courses:")
-    for course in courses:
+    for course in course_names():
         click.echo(f"- {course}")
 
 
@@ -28,13 +37,13 @@ def list_courses():
 def list_assignments(course):
     """List assignments for a specific course."""
     try:
-        module = __import__(f"iust_ai_toolkit.{course}", fromlist=[""])
-        assignments = [name for _, name, is_pkg in pkgutil.iter_modules(module.__path__) if is_pkg]
-        click.echo(f"Assignments for {course}:")
-        for assignment in assignments:
-            click.echo(f"- {assignment}")
-    except ImportError:
-        click.secho(f"Error: Course '{course}' not found.", fg="red", bold=True)
+        assignments = get_course(course).assignments
+    except KeyError as e:
+        click.secho(f"Error: {e.args[0]}", fg="red", bold=True)
+        return
+    click.echo(f"Assignments for {course}:")
+    for assignment in assignments:
+        click.echo(f"- {assignment.name} (--project {assignment.project})")
 
 
 @main.command()
@@ -44,19 +53,218 @@ def list_assignments(course):
 def submit(student_id, notebook_path, project):
     """Submit an assignment"""
     click.echo(f"Submitting {project} assignment for student {student_id}")
-    if project == "decision-tree":
-        submit_notebook(student_id, notebook_path)
-    else:
-        click.echo(f"Project {project} is not supported yet.")
+    try:
+        assignment = find_project(project)
+    except KeyError as e:
+        click.echo(e.args[0])
+        return
+    assignment.load(assignment.submit)(student_id, notebook_path)
     click.echo("Submission complete!")
 
 
 @main.command()
-@click.option("--directory", required=True, help="Directory containing submission zip files")
+@click.option(
+    "--manifest",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV with student_id and notebook columns, and optionally decision_tree",
+)
+@click.option(
+    "--output-dir",
+    default="submissions",
+    show_default=True,
+    help="Directory for the <student_id>-decision_tree_submission.zip files",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes",
+)
+@click.option(
+    "--compression-level",
+    type=click.IntRange(0, 9),
+    help="Deflate level for the notebook and extra files (default: stored, uncompressed)",
+)
+def pack(manifest, output_dir, workers, compression_level):
+    """Package many notebooks as submission zips"""
+    import time
+
+    # Relative paths in the manifest are relative to the manifest itself
+    root = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = {"student_id", "notebook"} - set(reader.fieldnames or ())
+        if missing:
+            click.secho(f"Error: the manifest has no {', '.join(sorted(missing))} column", fg="red")
+            return
+        jobs = [
+            (
+                row["student_id"].strip(),
+                os.path.join(root, row["notebook"]),
+                os.path.join(root, row["decision_tree"]) if row.get("decision_tree") else None,
+            )
+            for row in reader
+        ]
+
+    authenticator = _authenticator_class()(output_dir, use_cache=False)
+    click.secho(f"Packaging {len(jobs)} notebooks into {output_dir}.", fg="cyan")
+    start = time.perf_counter()
+    packed = 0
+    notebook_bytes = 0
+    failures = []
+    with click.progressbar(length=len(jobs), label="Packaging notebooks") as bar:
+        for student_id, _, size, error in authenticator.pack_submissions(
+            jobs, output_dir, workers, compression_level
+        ):
+            if error is None:
+                packed += 1
+                notebook_bytes += size
+            else:
+                failures.append((student_id, error))
+            bar.update(1)
+    seconds = time.perf_counter() - start
+
+    for student_id, error in failures:
+        click.secho(f"Failed {student_id}: {error}", fg="red")
+    click.secho(
+        f"Packaged {packed} of {len(jobs)} notebooks in {seconds:.2f}s: "
+        f"{packed / seconds:.1f} notebooks/s, {notebook_bytes / seconds / 1024 / 1024:.1f} MiB/s",
+        fg="green" if not failures else "yellow",
+    )
+
+
+@main.command()
+@click.option(
+    "--directory",
+    required=True,
+    type=click.Path(exists=True),
+    help="Directory (searched recursively) or LMS export zip containing the submission zips",
+)
 @click.option("--output", default="comparison_report.csv", help="Output CSV file name")
 @click.option("--verbose", is_flag=True, help="Generate verbose output")
-def compare_submissions(directory, output, verbose):
+@click.option("--no-cache", is_flag=True, help="Do not read or write the feature cache")
+@click.option("--clear-cache", is_flag=True, help="Delete the feature cache before comparing")
+@click.option(
+    "--cache-size",
+    default=DEFAULT_MAX_SIZE // (1024 * 1024),
+    show_default=True,
+    help="Maximum feature cache size in MiB",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes for preprocessing and scoring",
+)
+@click.option(
+    "--approximate",
+    is_flag=True,
+    help="Only score candidate pairs found by MinHash/LSH (for very large cohorts)",
+)
+@click.option(
+    "--lsh-bands", default=20, show_default=True, type=click.IntRange(min=1), help="LSH bands"
+)
+@click.option(
+    "--lsh-rows",
+    default=5,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="MinHash values per LSH band",
+)
+@click.option(
+    "--lsh-jaccard",
+    default=0.8,
+    show_default=True,
+    type=click.FloatRange(min=0.0, max=1.0),
+    help="Token 3-shingle Jaccard similarity at which to report the expected LSH recall",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Keep a similarity index in the directory and only score new or changed submissions",
+)
+@click.option(
+    "--rebuild-index",
+    is_flag=True,
+    help="Discard the similarity index and refit it on the current submissions",
+)
+@click.option(
+    "--tokenizer",
+    type=click.Choice(sorted(TOKENIZERS)),
+    default=DEFAULT_TOKENIZER,
+    show_default=True,
+    help="Tokenizer backend for cell similarity ('nltk' needs the nltk package and corpora)",
+)
+@click.option(
+    "--template",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Starter notebook whose code cells are ignored when comparing submissions",
+)
+@click.option(
+    "--min-similarity",
+    type=click.FloatRange(0.0, 1.0),
+    help="Only report pairs at least this similar",
+)
+@click.option(
+    "--top-k",
+    type=click.IntRange(min=1),
+    help="Only report pairs where one student is among the other's k most similar",
+)
+@click.option(
+    "--similarity-matrix",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the full similarity matrix to this memory-mapped .npy file",
+)
+@click.option(
+    "--memory-limit",
+    type=click.IntRange(min=1),
+    help="Approximate memory budget in MiB for scoring, independent of the cohort size "
+    "[default: 256]",
+)
+@click.option("--profile", is_flag=True, help="Print a per-stage timing breakdown")
+@click.option(
+    "--profile-trace",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the stage timings as a JSON trace (implies --profile)",
+)
+@click.option(
+    "--cprofile",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Run under cProfile and dump the stats to this file",
+)
+def compare_submissions(
+    directory,
+    output,
+    verbose,
+    no_cache,
+    clear_cache,
+    cache_size,
+    workers,
+    approximate,
+    lsh_bands,
+    lsh_rows,
+    lsh_jaccard,
+    incremental,
+    rebuild_index,
+    tokenizer,
+    template,
+    min_similarity,
+    top_k,
+    similarity_matrix,
+    memory_limit,
+    profile,
+    profile_trace,
+    cprofile,
+):
     """Compare multiple submissions and generate a report"""
+    from iust_ai_toolkit.abdi_4031.decision_tree_submission.submission_base import (
+        DEFAULT_MEMORY_LIMIT,
+    )
+
+    DecisionTreeSubmission = _authenticator_class()
     if not DecisionTreeSubmission.is_ta_version_installed():
         click.secho(
             "Error: TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature.",
@@ -65,31 +273,123 @@ def compare_submissions(directory, output, verbose):
         )
         return
 
-    authenticator = DecisionTreeSubmission(directory)
-    submissions = [f for f in os.listdir(directory) if f.endswith("-decision_tree_submission.zip")]
+    # The cache and index live next to an export archive
+    base_dir = (
+        directory if os.path.isdir(directory) else os.path.dirname(os.path.abspath(directory))
+    )
+    authenticator = DecisionTreeSubmission(
+        base_dir,
+        use_cache=not no_cache,
+        cache_size=cache_size * 1024 * 1024,
+        tokenizer=tokenizer,
+        template=template,
+    )
+    if profile or profile_trace:
+        authenticator.profiler = StageProfiler()
+    cprofiler = None
+    if cprofile:
+        import cProfile
+
+        cprofiler = cProfile.Profile()
+    if clear_cache:
+        FeatureCache(os.path.join(authenticator.base_dir, CACHE_DIR_NAME)).clear()
+        click.secho("Feature cache cleared.", fg="cyan")
+
+    submissions = authenticator.find_submissions(directory)
 
     click.secho(f"Found {len(submissions)} submissions to compare.", fg="cyan")
 
+    if incremental and approximate:
+        click.secho("Error: --incremental cannot be combined with --approximate.", fg="red")
+        return
+    filtered = min_similarity is not None or top_k is not None
+    if (incremental or rebuild_index) and (filtered or similarity_matrix):
+        click.secho(
+            "Error: --incremental cannot be combined with --min-similarity, --top-k or "
+            "--similarity-matrix.",
+            fg="red",
+        )
+        return
+    if approximate and (top_k is not None or similarity_matrix):
+        click.secho(
+            "Error: --approximate cannot be combined with --top-k or --similarity-matrix.",
+            fg="red",
+        )
+        return
+    all_pairs = len(submissions) * (len(submissions) - 1) // 2
+
+    lsh = None
+    if approximate:
+        from iust_ai_toolkit.lsh import MinHashLSH
+
+        lsh = MinHashLSH(bands=lsh_bands, rows=lsh_rows)
+        # Recall is a property of the shingle Jaccard similarity, not of the combined
+        # score the cheating threshold applies to
+        click.secho(
+            f"Approximate mode: {lsh_bands} bands x {lsh_rows} rows, expected recall "
+            f"{lsh.expected_recall(lsh_jaccard):.1%} for pairs with token 3-shingle Jaccard "
+            f"similarity {lsh_jaccard:.2f} (candidates start around {lsh.threshold:.2f})",
+            fg="cyan",
+        )
+
+    verbose_output = output.rsplit(".", 1)[0] + "_verbose.jsonl" if verbose else None
+    # Counts over every scored pair, filled in as iter_pair_results runs
+    scoring_stats = {}
+    if cprofiler is not None:
+        cprofiler.enable()
     try:
-        with click.progressbar(length=len(submissions), label="Analyzing submissions") as bar:
-            results, verbose_results, ignore_cheating = authenticator.analyze_all_submissions(
-                submissions, progress_callback=lambda: bar.update(1)
+        if incremental or rebuild_index:
+            stats = authenticator.refresh_index(submissions, workers=workers, rebuild=rebuild_index)
+            click.secho(
+                f"Index: {stats['changed']} new or changed, {stats['removed']} removed, "
+                f"{stats['pending']} to score.",
+                fg="cyan",
+            )
+            with click.progressbar(length=stats["pending"], label="Scoring submissions") as bar:
+                authenticator.score_index(progress_callback=lambda: bar.update(1))
+            pair_results = authenticator.iter_indexed_pairs(verbose=verbose)
+            total_comparisons, potential_cheating_count = write_comparison_report(
+                authenticator, pair_results, output, verbose_output
             )
-    except ImportError as e:
+        else:
+            with click.progressbar(
+                length=2 * len(submissions), label="Analyzing submissions"
+            ) as bar:
+                pair_results = authenticator.iter_pair_results(
+                    submissions,
+                    progress_callback=lambda: bar.update(1),
+                    workers=workers,
+                    lsh=lsh,
+                    verbose=verbose,
+                    min_similarity=min_similarity,
+                    top_k=top_k,
+                    similarity_path=similarity_matrix,
+                    memory_limit=(
+                        memory_limit * 1024 * 1024 if memory_limit else DEFAULT_MEMORY_LIMIT
+                    ),
+                    stats=scoring_stats,
+                )
+                total_comparisons, potential_cheating_count = write_comparison_report(
+                    authenticator, pair_results, output, verbose_output, scoring_stats
+                )
+    except (ImportError, LookupError) as e:
+        # LookupError: the nltk tokenizer backend is missing a corpus
         click.secho(f"Error: {str(e)}", fg="red", bold=True)
         return
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
+            cprofiler.dump_stats(cprofile)
+        authenticator.close()
 
-    with open(output, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Student 1", "Student 2", "Similarity", "Potential Cheating"])
-        for result in results:
-            potential_cheating = (
-                "Ignored"
-                if ignore_cheating
-                else ("Yes" if result[2] > authenticator.cheating_threshold else "No")
-            )
-            writer.writerow(result + (potential_cheating,))
-
+    pairs_scored = total_pairs = total_comparisons
+    if scoring_stats:
+        # Unreported pairs were scored too and count towards the cheating rate, and pairs
+        # LSH skipped count as not cheating
+        pairs_scored = scoring_stats["pairs_scored"]
+        total_pairs = scoring_stats["total_pairs"]
+        potential_cheating_count = scoring_stats["potential_cheating"]
+    ignore_cheating = authenticator.should_ignore_cheating(potential_cheating_count, total_pairs)
     click.secho(f"Comparison report saved to {output}", fg="green")
     if ignore_cheating:
         click.secho(
@@ -98,23 +398,399 @@ def compare_submissions(directory, output, verbose):
         )
 
     if verbose:
-        verbose_output = output.rsplit(".", 1)[0] + "_verbose.json"
-        with open(verbose_output, "w") as jsonfile:
-            json.dump(verbose_results, jsonfile, indent=2)
         click.secho(f"Verbose comparison report saved to {verbose_output}", fg="green")
 
     # Print summary
-    total_comparisons = len(results)
-    potential_cheating_count = sum(1 for r in results if r[2] > authenticator.cheating_threshold)
-
     click.echo("\nSummary:")
     click.secho(f"Total comparisons: {total_comparisons}", fg="cyan")
+    if approximate:
+        click.secho(f"Candidate pairs scored: {pairs_scored} of {all_pairs}", fg="cyan")
+    elif filtered:
+        click.secho(f"Pairs reported: {total_comparisons} of {all_pairs}", fg="cyan")
+    if similarity_matrix:
+        click.secho(f"Similarity matrix saved to {similarity_matrix}", fg="green")
     click.secho(
         f"Potential cheating cases: {potential_cheating_count}",
         fg="yellow" if potential_cheating_count > 0 else "green",
     )
     click.secho(f"Cheating threshold: {authenticator.cheating_threshold:.2f}", fg="cyan")
 
+    if authenticator.profiler.enabled:
+        click.echo("\nProfile:")
+        click.echo(authenticator.profiler.format_table())
+        if profile_trace:
+            authenticator.profiler.write_trace(profile_trace)
+            click.secho(f"Profile trace saved to {profile_trace}", fg="green")
+    if cprofiler is not None:
+        click.secho(f"cProfile stats saved to {cprofile}", fg="green")
+
+
+@main.command()
+@click.option(
+    "--directory",
+    required=True,
+    type=click.Path(exists=True),
+    help="Directory (searched recursively) or LMS export zip containing the submission zips",
+)
+@click.option("--student-id", required=True, help="Student whose closest submissions to find")
+@click.option("--k", default=10, show_default=True, type=click.IntRange(min=1), help="Matches")
+@click.option("--no-cache", is_flag=True, help="Do not read or write the feature cache")
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes for preprocessing",
+)
+@click.option(
+    "--tokenizer",
+    type=click.Choice(sorted(TOKENIZERS)),
+    default=DEFAULT_TOKENIZER,
+    show_default=True,
+    help="Tokenizer backend for cell similarity",
+)
+@click.option(
+    "--template",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Starter notebook whose code cells are ignored when comparing submissions",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the matches as JSON")
+def nearest(directory, student_id, k, no_cache, workers, tokenizer, template, as_json):
+    """Show the submissions most similar to one student's submission"""
+    DecisionTreeSubmission = _authenticator_class()
+    if not DecisionTreeSubmission.is_ta_version_installed():
+        click.secho(
+            "Error: TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature.",
+            fg="red",
+            bold=True,
+        )
+        return
+
+    base_dir = (
+        directory if os.path.isdir(directory) else os.path.dirname(os.path.abspath(directory))
+    )
+    authenticator = DecisionTreeSubmission(
+        base_dir, use_cache=not no_cache, tokenizer=tokenizer, template=template
+    )
+    submissions = authenticator.find_submissions(directory)
+    try:
+        with authenticator:
+            matches = authenticator.nearest(student_id, k, submissions, workers)
+    except (ValueError, LookupError) as e:
+        click.secho(f"Error: {str(e)}", fg="red", bold=True)
+        return
+
+    if as_json:
+        click.echo(json.dumps(matches, indent=2))
+        return
+
+    click.secho(
+        f"Closest {len(matches)} of {len(submissions) - 1} submissions to {student_id}:", fg="cyan"
+    )
+    click.echo(f"{'Student':<15} {'Similarity':>10} {'Cells':>7} {'Methods':>8} {'Estimates':>9}")
+    for match in matches:
+        click.secho(
+            f"{match['student_id']:<15} {match['similarity']:>10.3f} "
+            f"{match['cell_similarity']:>7.3f} {match['method_similarity']:>8.3f} "
+            f"{match['estimation_similarity']:>9.3f}",
+            fg="yellow" if match["potential_cheating"] else None,
+        )
+
+
+@main.command()
+@click.option("--directory", required=True, help="Directory containing the submissions to watch")
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on")
+@click.option("--port", default=8765, show_default=True, help="Port to listen on")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    help="Listen on this Unix socket instead of TCP",
+)
+@click.option(
+    "--poll-interval",
+    default=2.0,
+    show_default=True,
+    type=click.FloatRange(min=0.1),
+    help="Seconds between directory scans",
+)
+@click.option(
+    "--output",
+    default="comparison_report.csv",
+    show_default=True,
+    help="CSV file written by POST /report",
+)
+@click.option(
+    "--rebuild-index",
+    is_flag=True,
+    help="Discard the similarity index and refit it on the current submissions at startup",
+)
+@click.option("--no-cache", is_flag=True, help="Do not read or write the feature cache")
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes for preprocessing",
+)
+@click.option(
+    "--tokenizer",
+    type=click.Choice(sorted(TOKENIZERS)),
+    default=DEFAULT_TOKENIZER,
+    show_default=True,
+    help="Tokenizer backend for cell similarity",
+)
+@click.option(
+    "--template",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Starter notebook whose code cells are ignored when comparing submissions",
+)
+def serve(
+    directory,
+    host,
+    port,
+    socket_path,
+    poll_interval,
+    output,
+    rebuild_index,
+    no_cache,
+    workers,
+    tokenizer,
+    template,
+):
+    """Watch a submissions directory, score new arrivals and answer queries over HTTP"""
+    DecisionTreeSubmission = _authenticator_class()
+    if not DecisionTreeSubmission.is_ta_version_installed():
+        click.secho(
+            "Error: TA version is not installed. Please install iust_ai_toolkit[ta] to use this feature.",
+            fg="red",
+            bold=True,
+        )
+        return
+
+    from iust_ai_toolkit.server import ComparisonService, make_server
+
+    authenticator = DecisionTreeSubmission(
+        directory, use_cache=not no_cache, tokenizer=tokenizer, template=template
+    )
+    service = ComparisonService(authenticator, poll_interval, workers, output)
+    stats = service.start(rebuild=rebuild_index)
+    click.secho(
+        f"Indexed {directory}: {stats['changed']} new or changed, "
+        f"{stats['scored']} scored in {stats['seconds']}s.",
+        fg="cyan",
+    )
+
+    server = make_server(service, host, port, socket_path)
+    address = f"unix socket {socket_path}" if socket_path else f"http://{host}:{port}"
+    click.secho(f"Serving on {address} (Ctrl+C to stop)", fg="green")
+    # Shut down cleanly (and remove the socket) when stopped by a service manager too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+@main.command()
+@click.option(
+    "--directory",
+    required=True,
+    type=click.Path(exists=True),
+    help="Directory (searched recursively) or LMS export zip containing the submission zips",
+)
+@click.option(
+    "--dataset",
+    "datasets",
+    required=True,
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV dataset to grade on; repeat for several",
+)
+@click.option("--target", help="Label column of the datasets (default: the last column)")
+@click.option(
+    "--test-size",
+    default=0.2,
+    show_default=True,
+    type=click.FloatRange(0.0, 1.0, min_open=True, max_open=True),
+    help="Fraction of each dataset held out for accuracy",
+)
+@click.option("--seed", default=0, show_default=True, help="Seed of the train/test split")
+@click.option(
+    "--class-name",
+    default="DecisionTree",
+    show_default=True,
+    help="Model class in decision_tree.py, with fit(X, y) and predict(X)",
+)
+@click.option("--params", default="{}", show_default=True, help="JSON keyword arguments for it")
+@click.option("--output", default="grades.csv", show_default=True, help="Output CSV file")
+@click.option(
+    "--workers",
+    default=os.cpu_count() or 1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of submissions graded at once",
+)
+@click.option(
+    "--timeout",
+    default=60.0,
+    show_default=True,
+    type=click.FloatRange(min=0.1),
+    help="Wall-clock seconds per submission, all datasets included",
+)
+@click.option(
+    "--cpu-time",
+    type=click.IntRange(min=1),
+    help="CPU seconds per submission (default: just above the timeout)",
+)
+@click.option(
+    "--memory-limit",
+    default=1024,
+    show_default=True,
+    type=click.IntRange(min=64),
+    help="Address-space limit per submission in MiB",
+)
+def grade(
+    directory,
+    datasets,
+    target,
+    test_size,
+    seed,
+    class_name,
+    params,
+    output,
+    workers,
+    timeout,
+    cpu_time,
+    memory_limit,
+):
+    """Run every submission's decision_tree.py on local datasets and record its results"""
+    import tempfile
+
+    from iust_ai_toolkit.grading import RESULT_FIELDS, Autograder, prepare_dataset
+    from iust_ai_toolkit.submission_sources import find_submission_sources
+
+    try:
+        params = json.loads(params)
+    except ValueError as e:
+        click.secho(f"Error: --params is not valid JSON: {e}", fg="red", bold=True)
+        return
+    sources = find_submission_sources(directory)
+    click.secho(f"Found {len(sources)} submissions to grade.", fg="cyan")
+
+    statuses = {}
+    slowest = []
+    with tempfile.TemporaryDirectory(prefix="iust-ai-datasets-") as dataset_dir:
+        prepared = {}
+        for index, path in enumerate(datasets):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in prepared:
+                name = f"{name}-{index}"
+            prepared[name] = os.path.join(dataset_dir, f"{index}.npz")
+            prepare_dataset(path, prepared[name], target, test_size, seed)
+        grader = Autograder(
+            prepared,
+            class_name=class_name,
+            params=params,
+            timeout=timeout,
+            cpu_time=cpu_time,
+            memory_mb=memory_limit,
+            workers=workers,
+        )
+
+        with open(output, "w", newline="") as f, click.progressbar(
+            length=len(sources), label="Grading submissions"
+        ) as bar:
+            writer = csv.DictWriter(f, RESULT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for rows in grader.grade(sources):
+                writer.writerows(rows)
+                # Results are usable while a long run is still going
+                f.flush()
+                for row in rows:
+                    statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+                    if row.get("fit_seconds") is not None:
+                        slowest.append((row["fit_seconds"], row["student_id"], row["dataset"]))
+                bar.update(1)
+
+    click.secho(f"Grades saved to {output}", fg="green")
+    click.echo("\nSummary:")
+    for status, count in sorted(statuses.items()):
+        click.secho(f"{status}: {count}", fg="green" if status == "ok" else "yellow")
+    if slowest:
+        click.echo("Slowest fits:")
+        for seconds, student_id, dataset in sorted(slowest, reverse=True)[:5]:
+            click.echo(f"  {student_id} on {dataset}: {seconds:.2f}s")
+
+
+def write_comparison_report(
+    authenticator, pair_results, output, verbose_output=None, scoring_stats=None
+):
+    """Stream pair results to the CSV report (and a JSON Lines verbose report).
+
+    Whether cheating is ignored is only known once every pair has been seen, so rows are
+    first written to a temporary file with their Yes/No verdict and relabelled while
+    being copied into place if needed. ``scoring_stats`` is the ``stats`` dict passed to
+    ``iter_pair_results``; when given, the decision uses its counts over every pair of
+    the cohort rather than only the reported ones. Returns ``(total_comparisons,
+    potential_cheating)`` for the reported pairs.
+    """
+    total_comparisons = 0
+    potential_cheating_count = 0
+    partial_output = output + ".partial"
+    profiler = authenticator.profiler
+
+    verbose_file = open(verbose_output, "w") if verbose_output else None
+    try:
+        # Scoring runs inside this stage as the results are consumed; its own stages are
+        # nested, so the self time of report_write is the cost of writing alone
+        with profiler.stage("report_write"), open(partial_output, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Student 1", "Student 2", "Similarity", "Potential Cheating"])
+            for student_id1, student_id2, similarity, verbose_result in pair_results:
+                total_comparisons += 1
+                potential_cheating = authenticator.is_potential_cheating(similarity)
+                potential_cheating_count += potential_cheating
+                writer.writerow(
+                    [student_id1, student_id2, similarity, "Yes" if potential_cheating else "No"]
+                )
+                if verbose_file is not None:
+                    verbose_file.write(
+                        json.dumps({"pair": f"{student_id1}-{student_id2}", **verbose_result})
+                        + "\n"
+                    )
+    finally:
+        if verbose_file is not None:
+            verbose_file.close()
+
+    if scoring_stats:
+        ignore_cheating = authenticator.should_ignore_cheating(
+            scoring_stats["potential_cheating"], scoring_stats["total_pairs"]
+        )
+    else:
+        ignore_cheating = authenticator.should_ignore_cheating(
+            potential_cheating_count, total_comparisons
+        )
+    if ignore_cheating:
+        with profiler.stage("report_relabel"), open(partial_output, newline="") as src, open(
+            output, "w", newline=""
+        ) as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            writer.writerow(next(reader))
+            for row in reader:
+                writer.writerow(row[:3] + ["Ignored"])
+        os.remove(partial_output)
+    else:
+        os.replace(partial_output, output)
+
+    return total_comparisons, potential_cheating_count
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+CACHE_DIR_NAME = ".iust_ai_cache"
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # 512 MiB
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """On-disk store of per-submission features keyed by the content hash of the zip.
+
+    Entries are small JSON files in a sidecar directory. Reading an entry refreshes its
+    mtime so that, once the directory grows past ``max_size`` bytes, the least recently
+    used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+        if self._size is not None and os.path.exists(path):
+            self._size -= os.path.getsize(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+        if self._size is not None:
+            self._size += os.path.getsize(path)
+        if self.size() > self.max_size:
+            self.evict()
+
+    def size(self) -> int:
+        if self._size is None:
+            self._size = sum(os.path.getsize(path) for path, _ in self._entries())
+        return self._size
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((path, os.path.getmtime(path)))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in ``max_size``."""
+        size = self.size()
+        for path, _ in sorted(self._entries(), key=lambda entry: entry[1]):
+            if size <= self.max_size:
+                break
+            try:
+                entry_size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        self._size = 0
@@ -0,0 +1,176 @@
+"""Running each submission's ``decision_tree.py`` against local datasets, behind ``iust-ai grade``.
+
+Every submission runs in its own fresh interpreter (``_grade_runner.py``) in a temporary
+directory, so a crash, an endless loop or a memory blow-up only fails that student.
+The child caps its own CPU time, address space and file sizes with ``setrlimit`` and
+the parent kills it at the wall-clock timeout. This is resource isolation, not a
+security boundary: the code still runs as the current user.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .submission_sources import SubmissionSource, open_submission
+
+RESULT_FIELDS = [
+    "student_id",
+    "dataset",
+    "status",
+    "fit_seconds",
+    "predict_seconds",
+    "peak_memory_mb",
+    "accuracy",
+    "error",
+]
+
+_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_grade_runner.py")
+# One BLAS/OpenMP thread per child: the pool already uses every core
+_CHILD_ENV = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+_STDERR_TAIL = 500
+
+
+def prepare_dataset(
+    path: str, output: str, target: Optional[str] = None, test_size: float = 0.2, seed: int = 0
+):
+    """Split the CSV at ``path`` into shuffled train and test arrays saved to ``output``.
+
+    ``target`` is the label column (the last column by default). The ``.npz`` output is
+    what the graded processes load, so the CSV is parsed once per run, not per student.
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.read_csv(path)
+    labels = frame.pop(target if target is not None else frame.columns[-1]).to_numpy()
+    features = frame.to_numpy()
+    order = np.random.default_rng(seed).permutation(len(frame))
+    test_rows = min(len(frame) - 1, max(1, round(len(frame) * test_size)))
+    test, train = order[:test_rows], order[test_rows:]
+    np.savez(
+        output,
+        X_train=features[train],
+        y_train=labels[train],
+        X_test=features[test],
+        y_test=labels[test],
+    )
+
+
+class Autograder:
+    def __init__(
+        self,
+        datasets: Dict[str, str],
+        module: str = "decision_tree",
+        class_name: str = "DecisionTree",
+        params: Optional[Dict] = None,
+        timeout: float = 60.0,
+        cpu_time: Optional[int] = None,
+        memory_mb: int = 1024,
+        workers: Optional[int] = None,
+    ):
+        """``datasets`` maps dataset names to files from ``prepare_dataset``."""
+        self.datasets = datasets
+        self.module = module
+        self.class_name = class_name
+        self.params = params or {}
+        self.timeout = timeout
+        self.cpu_time = cpu_time if cpu_time is not None else int(timeout) + 1
+        self.memory_mb = memory_mb
+        self.workers = workers or os.cpu_count() or 1
+
+    def _rows(self, student_id: str, status: str, error: Optional[str] = None) -> List[Dict]:
+        return [
+            {"student_id": student_id, "dataset": name, "status": status, "error": error}
+            for name in self.datasets
+        ]
+
+    def grade_submission(self, source: SubmissionSource) -> List[Dict]:
+        """Run one submission against every dataset; returns one result per dataset."""
+        with tempfile.TemporaryDirectory(prefix="iust-ai-grade-") as workdir:
+            archives = {}
+            try:
+                with open_submission(source, archives) as zipf:
+                    code = zipf.read(f"{self.module}.py")
+            except KeyError:
+                return self._rows(source.student_id, "missing", f"No {self.module}.py")
+            except (zipfile.BadZipFile, OSError) as e:
+                return self._rows(source.student_id, "bad_zip", str(e))
+            finally:
+                for f in archives.values():
+                    f.close()
+            with open(os.path.join(workdir, f"{self.module}.py"), "wb") as f:
+                f.write(code)
+
+            result_path = os.path.join(workdir, ".results.json")
+            stderr_path = os.path.join(workdir, ".stderr")
+            command = [
+                sys.executable,
+                "-E",
+                _RUNNER,
+                result_path,
+                str(self.cpu_time),
+                str(self.memory_mb),
+                self.module,
+                self.class_name,
+                json.dumps(self.params),
+                *self.datasets.values(),
+            ]
+            with open(stderr_path, "wb") as stderr:
+                process = subprocess.Popen(
+                    command,
+                    cwd=workdir,
+                    env={**os.environ, **_CHILD_ENV},
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr,
+                    # Own process group, so anything the submission spawns is killed too
+                    start_new_session=os.name == "posix",
+                )
+                try:
+                    process.wait(timeout=self.timeout)
+                    status = None
+                except subprocess.TimeoutExpired:
+                    if os.name == "posix":
+                        os.killpg(process.pid, signal.SIGKILL)
+                    else:
+                        process.kill()
+                    process.wait()
+                    status = "timeout"
+
+            if status is None and process.returncode != 0:
+                killed_by = -process.returncode
+                if os.name == "posix" and killed_by in (signal.SIGXCPU, signal.SIGKILL):
+                    status = "cpu_limit"
+                else:
+                    status = "crashed"
+            finished = {}
+            if os.path.exists(result_path):
+                with open(result_path) as f:
+                    finished = {result["dataset"]: result for result in json.load(f)}
+            with open(stderr_path, "rb") as f:
+                f.seek(max(0, os.path.getsize(stderr_path) - _STDERR_TAIL))
+                stderr_tail = f.read().decode(errors="replace").strip() or None
+
+        rows = []
+        for name, path in self.datasets.items():
+            result = finished.get(path)
+            if result is None:
+                result = {"status": status or "crashed", "error": stderr_tail}
+            rows.append({**result, "student_id": source.student_id, "dataset": name})
+        return rows
+
+    def grade(self, sources: Iterable[SubmissionSource]) -> Iterator[List[Dict]]:
+        """Grade submissions on ``workers`` parallel processes, yielding each as it finishes."""
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(self.grade_submission, source) for source in sources]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,85 @@
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_MAX_HASH = _MERSENNE_PRIME
+
+
+def shingle_hashes(tokens: List[str], shingle_size: int) -> np.ndarray:
+    """Hash every run of ``shingle_size`` consecutive tokens to a 31-bit integer."""
+    if len(tokens) < shingle_size:
+        shingles = {" ".join(tokens)} if tokens else set()
+    else:
+        shingles = {
+            " ".join(tokens[i : i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)
+        }
+    # blake2b rather than hash(): it must not depend on PYTHONHASHSEED across processes
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+            % _MERSENNE_PRIME
+            for s in shingles
+        ),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+class MinHashLSH:
+    """MinHash signatures with LSH banding to find candidate pairs of similar documents.
+
+    Each signature has ``bands * rows`` values. Two documents become candidates when all
+    ``rows`` values of at least one band agree, which happens with probability
+    ``1 - (1 - s ** rows) ** bands`` for documents with shingle Jaccard similarity ``s``.
+    """
+
+    def __init__(self, bands: int = 20, rows: int = 5, shingle_size: int = 3, seed: int = 0):
+        if bands < 1 or rows < 1 or shingle_size < 1:
+            raise ValueError("bands, rows and shingle_size must be positive")
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text.split(), self.shingle_size)
+        if len(hashes) == 0:
+            return np.full(self.bands * self.rows, _MAX_HASH, dtype=np.uint64)
+        # Operands are below 2**31, so the products fit in 64 bits without overflow
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def signatures(self, texts: Iterable[str]) -> np.ndarray:
+        rows = [self.signature(text) for text in texts]
+        if not rows:
+            return np.empty((0, self.bands * self.rows), dtype=np.uint64)
+        return np.vstack(rows)
+
+    def candidate_pairs(self, signatures: np.ndarray) -> Set[Tuple[int, int]]:
+        candidates = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = defaultdict(list)
+            band_values = signatures[:, band * self.rows : (band + 1) * self.rows]
+            for index, values in enumerate(band_values):
+                buckets[values.tobytes()].append(index)
+            for members in buckets.values():
+                for position, i in enumerate(members):
+                    for j in members[position + 1 :]:
+                        candidates.add((i, j))
+        return candidates
+
+    def expected_recall(self, similarity: float) -> float:
+        """Probability that a pair with shingle Jaccard ``similarity`` becomes a candidate."""
+        return 1 - (1 - similarity**self.rows) ** self.bands
+
+    @property
+    def threshold(self) -> float:
+        """Shingle Jaccard similarity around which pairs start becoming candidates."""
+        return (1 / self.bands) ** (1 / self.rows)
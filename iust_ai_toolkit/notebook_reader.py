@@ -0,0 +1,184 @@
+import json
+import re
+from typing import IO, Any, Dict, Iterator
+
+_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r"[,\]}\s]")
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Minimal pull parser over a text stream, read in fixed-size chunks.
+
+    Only values the caller asks for are decoded; everything else is skipped by scanning
+    for structural characters, so large values (e.g. base64 image outputs) are never
+    materialised.
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = _CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def _error(self, message: str):
+        raise ValueError(f"Invalid notebook JSON: {message}")
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                self._error("unexpected end of file")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            self._error(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        char = self.peek()
+        if char == '"':
+            self.pos += 1
+            self._skip_string()
+        elif char in "[{":
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def _skip_string(self):
+        # Called with pos just past the opening quote. str.find is much faster than a
+        # regex over the long escape-free runs that make up base64 outputs; the quote
+        # position is reused across escapes so text full of "\n" stays linear.
+        quote = None
+        while True:
+            if quote is None or 0 <= quote < self.pos:
+                quote = self.buf.find('"', self.pos)
+            backslash = self.buf.find("\\", self.pos, len(self.buf) if quote < 0 else quote)
+            if backslash >= 0:
+                if backslash + 1 < len(self.buf):
+                    self.pos = backslash + 2
+                    continue
+                # Escape at the end of the buffer: keep the backslash for the next chunk
+                self.pos = backslash
+            elif quote >= 0:
+                self.pos = quote + 1
+                return
+            else:
+                self.pos = len(self.buf)
+            if not self._fill():
+                self._error("unterminated string")
+            quote = None
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    self._error("unterminated array or object")
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == '"':
+                self._skip_string()
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_scalar(self):
+        while True:
+            match = _SCALAR_END.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return
+            self.pos = len(self.buf)
+            if not self._fill():
+                return
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """Yield each key of the object at the cursor; the caller must consume its value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def iter_array_items(self) -> Iterator[None]:
+        """Yield once per item of the array at the cursor; the caller must consume it."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+
+def iter_notebook_cells(
+    f: IO[str], keys=("cell_type", "source"), chunk_size: int = _CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Yield the requested ``keys`` of every cell of an ``.ipynb`` stream.
+
+    Unlike ``json.load`` this never builds ``outputs``, ``attachments`` or any other key
+    that was not asked for, so memory use follows the size of the code, not the notebook.
+    """
+    stream = _JsonStream(f, chunk_size)
+    for key in stream.iter_object_keys():
+        if key != "cells":
+            stream.skip_value()
+            continue
+        for _ in stream.iter_array_items():
+            cell = {}
+            for cell_key in stream.iter_object_keys():
+                if cell_key in keys:
+                    cell[cell_key] = stream.read_value()
+                else:
+                    stream.skip_value()
+            yield cell
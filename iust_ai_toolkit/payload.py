@@ -0,0 +1,103 @@
+"""Reading and writing the encoded notebook payload stored inside submission zips.
+
+Version 2 layout (current):
+
+- ``encoded_notebook.json``: ``{"format_version": 2, "implemented_methods": [...],
+  "estimations": {...}}``
+- ``cells.npz`` (stored uncompressed): the raw UTF-8 text of every code cell as one
+  ``uint8`` buffer with ``int64`` offsets.
+
+Version 1 (legacy) kept everything in ``encoded_notebook.json``: base64-encoded cells and
+a dense TF-IDF list per cell. It is still readable.
+"""
+
+import base64
+import io
+import json
+import zipfile
+from typing import Any, Dict
+
+from .profiling import NULL_PROFILER
+
+PAYLOAD_VERSION = 2
+METADATA_MEMBER = "encoded_notebook.json"
+CELLS_MEMBER = "cells.npz"
+# Every member gets this timestamp, so the same notebook always packs to the same bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def zip_member(name: str, compress_type: int = zipfile.ZIP_STORED) -> zipfile.ZipInfo:
+    """Header for a zip member that does not depend on the clock, umask or platform."""
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+    info.compress_type = compress_type
+    info.create_system = 3  # Unix
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def write_payload(zipf: zipfile.ZipFile, encoded_data: Dict[str, Any]):
+    import numpy as np
+
+    cells = encoded_data["cells"]
+    encoded = [cell.encode() for cell in cells]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(cell) for cell in encoded])
+
+    arrays = {
+        "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "text_offsets": offsets,
+    }
+    # Like np.savez, but without the wall-clock timestamps np.savez puts in the npz
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as npz:
+        for name, array in arrays.items():
+            with npz.open(zip_member(f"{name}.npy"), "w") as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+    zipf.writestr(zip_member(CELLS_MEMBER), buffer.getvalue())
+
+    metadata = {
+        "format_version": PAYLOAD_VERSION,
+        "implemented_methods": encoded_data["implemented_methods"],
+        "estimations": encoded_data["estimations"],
+    }
+    zipf.writestr(
+        zip_member(METADATA_MEMBER, zipf.compression),
+        json.dumps(metadata),
+        compresslevel=zipf.compresslevel,
+    )
+
+
+def read_payload(zipf: zipfile.ZipFile, profiler=NULL_PROFILER) -> Dict[str, Any]:
+    """Read the payload of an open submission zip in any supported version.
+
+    Returns ``cells`` (raw cell text), ``implemented_methods`` and ``estimations``.
+    """
+    with profiler.stage("zip_io"):
+        raw = zipf.read(METADATA_MEMBER)
+    profiler.count("payload_bytes", len(raw))
+    with profiler.stage("json_parse"):
+        metadata = json.loads(raw)
+
+    version = metadata.get("format_version", 1)
+    if version == 1:
+        return {
+            "cells": [base64.b64decode(cell).decode() for cell in metadata["encoded_cells"]],
+            "implemented_methods": metadata["implemented_methods"],
+            "estimations": metadata["estimations"],
+        }
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported encoded notebook format version: {version}")
+
+    import numpy as np
+
+    # The member is stored uncompressed, so np.load reads the arrays straight from the
+    # archive without inflating a copy of the whole npz first
+    with profiler.stage("payload_decode"), zipf.open(CELLS_MEMBER) as f, np.load(f) as arrays:
+        text = arrays["text"].tobytes()
+        offsets = arrays["text_offsets"]
+        cells = [text[offsets[i] : offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+    return {
+        "cells": cells,
+        "implemented_methods": metadata["implemented_methods"],
+        "estimations": metadata["estimations"],
+    }
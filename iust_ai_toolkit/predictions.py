@@ -0,0 +1,66 @@
+"""Writing prediction files (``id,prediction``) without holding them in memory twice."""
+
+import csv
+import gzip
+import itertools
+from typing import Any, Iterable, Iterator, List, Optional
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def _array_chunks(predictions, chunk_size: int) -> Iterator[List[Any]]:
+    if predictions.ndim == 2 and predictions.shape[1] == 1:
+        predictions = predictions[:, 0]
+    if predictions.ndim != 1:
+        raise ValueError(f"Expected one prediction per row, got shape {predictions.shape}")
+    for start in range(0, len(predictions), chunk_size):
+        chunk = predictions[start : start + chunk_size]
+        if chunk.dtype.kind == "f" and chunk.dtype.itemsize < 8:
+            # Shortest repr of the float32 value (0.1, not 0.10000000149011612)
+            yield chunk.astype(str).tolist()
+        else:
+            yield chunk.tolist()
+
+
+def _iterable_chunks(predictions: Iterable, chunk_size: int) -> Iterator[List[Any]]:
+    iterator = iter(predictions)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_predictions_csv(
+    predictions: Iterable,
+    path: str = "./submission.csv",
+    compress: Optional[bool] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Write ``predictions`` as ``id,prediction`` rows with ids from 1 and return the count.
+
+    ``predictions`` is a numpy array, a list or any iterable, including a generator; rows
+    are written ``chunk_size`` at a time, so an iterable is never materialised. The file
+    is gzip-compressed when ``compress`` is true, or by default when ``path`` ends in
+    ``.gz``.
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+    if hasattr(predictions, "ndim") and hasattr(predictions, "dtype"):
+        chunks = _array_chunks(predictions, chunk_size)
+    else:
+        chunks = _iterable_chunks(predictions, chunk_size)
+
+    if compress:
+        f = gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    else:
+        f = open(path, "w", newline="", encoding="utf-8")
+    count = 0
+    with f:
+        # Same dialect as DataFrame.to_csv: minimal quoting, "\n" line endings
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["id", "prediction"])
+        for chunk in chunks:
+            writer.writerows(zip(range(count + 1, count + len(chunk) + 1), chunk))
+            count += len(chunk)
+    return count
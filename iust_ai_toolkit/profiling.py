@@ -0,0 +1,130 @@
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class NullProfiler:
+    """Profiler that records nothing; the default, so instrumentation costs next to nothing."""
+
+    enabled = False
+    _context = contextlib.nullcontext()
+
+    def stage(self, name: str):
+        return self._context
+
+    def count(self, name: str, amount: int = 1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class StageProfiler:
+    """Collects wall time, call counts, counters and peak RSS per named pipeline stage.
+
+    Stages may nest. ``total`` is the inclusive time of a stage and ``self`` excludes the
+    time spent in stages nested inside it, so the ``self`` column adds up to the
+    instrumented wall time. Never keep a stage open across a ``yield``.
+    """
+
+    enabled = True
+
+    def __init__(self, record_events: bool = True):
+        self.record_events = record_events
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.events = []
+        self._children = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = {
+                    "calls": 0,
+                    "total": 0.0,
+                    "self": 0.0,
+                    "peak_rss_mb": 0.0,
+                }
+            stat["calls"] += 1
+            stat["total"] += elapsed
+            stat["self"] += elapsed - children
+            stat["peak_rss_mb"] = max(stat["peak_rss_mb"], peak_rss_mb())
+            if self.record_events:
+                self.events.append((name, start - self._origin, elapsed, len(self._children)))
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def summary(self) -> Dict:
+        return {
+            "wall_seconds": time.perf_counter() - self._origin,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stats,
+            "counters": dict(self.counters),
+        }
+
+    def format_table(self) -> str:
+        summary = self.summary()
+        wall = summary["wall_seconds"] or 1.0
+        lines = [
+            f"{'Stage':<20} {'Calls':>8} {'Total s':>10} {'Self s':>10} {'Self %':>7} {'Peak MiB':>9}"
+        ]
+        for name, stat in sorted(self.stats.items(), key=lambda item: -item[1]["self"]):
+            lines.append(
+                f"{name:<20} {stat['calls']:>8} {stat['total']:>10.3f} {stat['self']:>10.3f} "
+                f"{stat['self'] / wall:>7.1%} {stat['peak_rss_mb']:>9.1f}"
+            )
+        lines.append(f"{'wall':<20} {'':>8} {wall:>10.3f}")
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def write_trace(self, path: str):
+        """Write the summary plus every stage as Chrome trace events (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        trace = {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": {"depth": depth},
+                }
+                for name, start, elapsed, depth in self.events
+            ],
+            "summary": self.summary(),
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
@@ -0,0 +1,75 @@
+"""Static registry of the courses and assignments in the toolkit.
+
+The CLI lists courses and assignments and dispatches ``submit --project`` from this
+table alone, so no course package is imported until one is actually used. Adding an
+assignment means adding it here; a test checks the table against the packages on disk.
+"""
+
+import importlib
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class Assignment:
+    course: str
+    name: str
+    # Value of ``iust-ai submit --project``
+    project: str
+    # Names in the assignment package: ``submit(student_id, notebook_path)`` and the
+    # authenticator class used by the TA commands
+    submit: str
+    authenticator: str
+
+    @property
+    def module(self) -> str:
+        return f"iust_ai_toolkit.{self.course}.{self.name}"
+
+    def load(self, attribute: str):
+        """Import the assignment package and return ``attribute`` from it."""
+        return getattr(importlib.import_module(self.module), attribute)
+
+
+@dataclass(frozen=True)
+class Course:
+    name: str
+    assignments: Tuple[Assignment, ...]
+
+
+COURSES: Dict[str, Course] = {
+    course.name: course
+    for course in [
+        Course(
+            "abdi_4031",
+            (
+                Assignment(
+                    course="abdi_4031",
+                    name="decision_tree_submission",
+                    project="decision-tree",
+                    submit="submit_notebook",
+                    authenticator="DecisionTreeSubmission",
+                ),
+            ),
+        ),
+    ]
+}
+
+
+def course_names() -> List[str]:
+    return sorted(COURSES)
+
+
+def get_course(name: str) -> Course:
+    try:
+        return COURSES[name]
+    except KeyError:
+        raise KeyError(f"Course '{name}' not found.") from None
+
+
+def find_project(project: str) -> Assignment:
+    """Return the assignment submitted with ``--project project``."""
+    for course in COURSES.values():
+        for assignment in course.assignments:
+            if assignment.project == project:
+                return assignment
+    raise KeyError(f"Project {project} is not supported yet.")
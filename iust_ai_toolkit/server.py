@@ -0,0 +1,262 @@
+"""Long-running comparison service behind ``iust-ai serve``.
+
+The service keeps one authenticator alive, so imports, the tokenizer and per-submission
+features stay warm between runs. It watches the submissions directory and scores every
+new or changed zip against the cohort through the similarity index as soon as it lands.
+Results are served as JSON over HTTP on localhost or on a Unix socket:
+
+- ``GET /status``: cohort size, the last update and any error
+- ``GET /pairs?student_id=&min_similarity=&limit=``: the most similar scored pairs
+- ``GET /nearest?student_id=&k=``: a student's closest submissions with component scores
+- ``POST /refresh``: rescan the directory now; ``?rebuild=1`` also discards the index and
+  refits it on the current submissions
+- ``POST /report``: write the CSV report, like ``compare-submissions``
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .similarity_index import SimilarityIndex
+from .submission_sources import SUBMISSION_SUFFIX
+
+
+class ComparisonService:
+    def __init__(
+        self,
+        authenticator,
+        poll_interval: float = 2.0,
+        workers: int = 1,
+        output: str = "comparison_report.csv",
+    ):
+        self.authenticator = authenticator
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.output = output
+        self.lock = threading.Lock()
+        self.last_update: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._previous: Dict[str, Tuple[float, int]] = {}
+        self._indexed: Dict[str, Tuple[float, int]] = {}
+        # The index's frozen TF-IDF model, so /nearest scores cells like /pairs
+        self._tfidf_model: Optional[Dict] = None
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        states = {}
+        with os.scandir(self.authenticator.base_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(SUBMISSION_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    states[entry.name] = (stat.st_mtime, stat.st_size)
+        return states
+
+    def update(self, submissions: Dict[str, Tuple[float, int]], rebuild: bool = False) -> Dict:
+        """Index ``submissions`` (zip name to ``(mtime, size)``) and score what changed.
+
+        ``rebuild`` discards the index first, refitting TF-IDF and rescoring every pair.
+        """
+        with self.lock:
+            start = time.perf_counter()
+            stats = self.authenticator.refresh_index(
+                sorted(submissions), workers=self.workers, rebuild=rebuild
+            )
+            stats["scored"] = self.authenticator.score_index()
+            with SimilarityIndex(self.authenticator.index_path) as index:
+                self._tfidf_model = index.get_meta("tfidf_model")
+            self.authenticator.prune_memos(name.split("-")[0] for name in submissions)
+            # Reopened on demand, so a replaced export archive is never read stale
+            self.authenticator.close()
+            stats["seconds"] = round(time.perf_counter() - start, 3)
+            stats["finished_at"] = time.time()
+            self._indexed = submissions
+            self.last_update = stats
+            self.last_error = None
+        return stats
+
+    def poll(self) -> Optional[Dict]:
+        """Score the zips that changed since the last update; ``None`` if nothing did.
+
+        A zip is only picked up once its size and mtime are the same on two consecutive
+        scans, so uploads still being copied in are not read half-written. A zip being
+        overwritten keeps its indexed state (and pairs) until the new one settles.
+        """
+        current = self._scan()
+        settled = {}
+        for name, state in current.items():
+            if self._previous.get(name) == state:
+                settled[name] = state
+            elif name in self._indexed:
+                settled[name] = self._indexed[name]
+        self._previous = current
+        if settled == self._indexed:
+            return None
+        return self.update(settled)
+
+    def refresh(self, rebuild: bool = False) -> Dict:
+        self._previous = self._scan()
+        return self.update(dict(self._previous), rebuild)
+
+    def start(self, rebuild: bool = False) -> Dict:
+        """Warm up, index everything already in the directory and start watching it."""
+        self.authenticator.tokenizer.prepare()
+        stats = self.refresh(rebuild)
+        self._watcher = threading.Thread(target=self._watch, name="submission-watcher", daemon=True)
+        self._watcher.start()
+        return stats
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        with self.lock:
+            self.authenticator.close()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                stats = self.poll()
+            except Exception as e:  # keep serving; the error is reported by /status
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Update failed: {self.last_error}", file=sys.stderr)
+                continue
+            if stats is not None:
+                print(
+                    f"Scored {stats['scored']} new or changed submissions in {stats['seconds']}s",
+                    file=sys.stderr,
+                )
+
+    def status(self) -> Dict:
+        with SimilarityIndex(self.authenticator.index_path) as index:
+            complete = len(index.student_ids(complete=True))
+            pending = len(index.student_ids(complete=False))
+        return {
+            "directory": os.path.abspath(self.authenticator.base_dir),
+            "submissions": complete + pending,
+            "pending": pending,
+            "cheating_threshold": self.authenticator.cheating_threshold,
+            "last_update": self.last_update,
+            "last_error": self.last_error,
+        }
+
+    def pairs(self, student_id: Optional[str], min_similarity: float, limit: int) -> Dict:
+        with SimilarityIndex(self.authenticator.index_path) as index:
+            rows = index.query_pairs(student_id, min_similarity, limit)
+        return {
+            "pairs": [
+                {
+                    "student_id1": student_id1,
+                    "student_id2": student_id2,
+                    "cell_similarity": cell_similarity,
+                    "similarity": similarity,
+                    "potential_cheating": self.authenticator.is_potential_cheating(similarity),
+                }
+                for student_id1, student_id2, cell_similarity, similarity in rows
+            ]
+        }
+
+    def nearest(self, student_id: str, k: int) -> Dict:
+        with self.lock:
+            matches = self.authenticator.nearest(
+                student_id, k, sorted(self._indexed), tfidf_model=self._tfidf_model
+            )
+        return {"student_id": student_id, "matches": matches}
+
+    def report(self) -> Dict:
+        from .cli import write_comparison_report
+
+        with self.lock:
+            total, potential = write_comparison_report(
+                self.authenticator,
+                self.authenticator.iter_indexed_pairs(verbose=False),
+                self.output,
+            )
+        return {
+            "output": os.path.abspath(self.output),
+            "total_comparisons": total,
+            "potential_cheating": potential,
+            "ignored": self.authenticator.should_ignore_cheating(potential, total),
+        }
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+    def _send_json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path == "/status":
+            return self._send_json(200, service.status())
+        if url.path == "/pairs":
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                min_similarity = float(query.get("min_similarity", 0.0))
+                limit = int(query.get("limit", 100))
+            except ValueError as e:
+                return self._send_json(400, {"error": str(e)})
+            return self._send_json(
+                200, service.pairs(query.get("student_id"), min_similarity, limit)
+            )
+        if url.path == "/nearest":
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                return self._send_json(
+                    200, service.nearest(query["student_id"], int(query.get("k", 10)))
+                )
+            except (KeyError, ValueError) as e:
+                return self._send_json(400, {"error": str(e)})
+        self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        path = url.path
+        try:
+            if path == "/refresh":
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                rebuild = query.get("rebuild", "0").lower() in ("1", "true", "yes")
+                return self._send_json(200, service.refresh(rebuild))
+            if path == "/report":
+                return self._send_json(200, service.report())
+        except Exception as e:
+            service.last_error = f"{type(e).__name__}: {e}"
+            return self._send_json(500, {"error": service.last_error})
+        self._send_json(404, {"error": f"Unknown endpoint {path}"})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: ComparisonService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[str] = None,
+):
+    """Return an HTTP server for ``service`` on ``host:port`` or on the Unix ``socket_path``."""
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _RequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), _RequestHandler)
+    server.service = service
+    return server
@@ -0,0 +1,147 @@
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_FILE_NAME = ".iust_ai_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    student_id TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    features TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    student_id1 TEXT NOT NULL,
+    student_id2 TEXT NOT NULL,
+    cell_similarity REAL NOT NULL,
+    overall_similarity REAL NOT NULL,
+    PRIMARY KEY (student_id1, student_id2)
+);
+-- Removing a submission deletes its pairs on either side; the primary key covers the first
+CREATE INDEX IF NOT EXISTS pairs_student_id2 ON pairs (student_id2);
+"""
+
+
+class SimilarityIndex:
+    """Persistent store of per-submission features and already scored pairs.
+
+    A submission is ``complete`` once its pairs against every earlier complete submission
+    are stored. Each submission is committed as it completes, so an interrupted run only
+    has to score the submissions that are still incomplete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_meta(self, key: str) -> Optional[Any]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value: Any):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def submission_states(self) -> Dict[str, Tuple[float, int, str]]:
+        """Return ``{student_id: (mtime, size, sha256)}`` for every indexed submission."""
+        rows = self.conn.execute("SELECT student_id, mtime, size, sha256 FROM submissions")
+        return {student_id: (mtime, size, sha) for student_id, mtime, size, sha in rows}
+
+    def touch_submission(self, student_id: str, mtime: float, size: int):
+        self.conn.execute(
+            "UPDATE submissions SET mtime = ?, size = ? WHERE student_id = ?",
+            (mtime, size, student_id),
+        )
+
+    def put_submission(self, student_id: str, mtime: float, size: int, sha256: str, features: Dict):
+        """Insert or replace a submission; its old pairs are dropped and it must be rescored."""
+        self.remove_submissions([student_id])
+        self.conn.execute(
+            "INSERT INTO submissions (student_id, mtime, size, sha256, features, complete) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (student_id, mtime, size, sha256, json.dumps(features)),
+        )
+
+    def remove_submissions(self, student_ids: Iterable[str]):
+        for student_id in student_ids:
+            self.conn.execute("DELETE FROM submissions WHERE student_id = ?", (student_id,))
+            self.conn.execute(
+                "DELETE FROM pairs WHERE student_id1 = ? OR student_id2 = ?",
+                (student_id, student_id),
+            )
+
+    def clear(self):
+        """Drop every submission and pair, e.g. before a rebuild."""
+        self.conn.execute("DELETE FROM pairs")
+        self.conn.execute("DELETE FROM submissions")
+
+    def reset_scores(self):
+        self.conn.execute("DELETE FROM pairs")
+        self.conn.execute("UPDATE submissions SET complete = 0")
+
+    def features(self) -> Dict[str, Dict]:
+        rows = self.conn.execute("SELECT student_id, features FROM submissions")
+        return {student_id: json.loads(features) for student_id, features in rows}
+
+    def student_ids(self, complete: bool) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT student_id FROM submissions WHERE complete = ? ORDER BY student_id",
+            (int(complete),),
+        )
+        return [student_id for (student_id,) in rows]
+
+    def complete_submission(self, student_id: str, pairs: Iterable[Tuple[str, str, float, float]]):
+        """Store the pairs of ``student_id`` and mark it complete in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pairs "
+                "(student_id1, student_id2, cell_similarity, overall_similarity) "
+                "VALUES (?, ?, ?, ?)",
+                pairs,
+            )
+            self.conn.execute(
+                "UPDATE submissions SET complete = 1 WHERE student_id = ?", (student_id,)
+            )
+
+    def commit(self):
+        self.conn.commit()
+
+    def query_pairs(
+        self, student_id: Optional[str] = None, min_similarity: float = 0.0, limit: int = 100
+    ) -> List[Tuple[str, str, float, float]]:
+        """Return the most similar stored pairs, optionally only those involving ``student_id``."""
+        where = "overall_similarity >= ?"
+        params: List[Any] = [min_similarity]
+        if student_id is not None:
+            where += " AND (student_id1 = ? OR student_id2 = ?)"
+            params += [student_id, student_id]
+        return self.conn.execute(
+            "SELECT student_id1, student_id2, cell_similarity, overall_similarity FROM pairs "
+            f"WHERE {where} ORDER BY overall_similarity DESC, student_id1, student_id2 LIMIT ?",
+            params + [limit],
+        ).fetchall()
+
+    def iter_pairs(self) -> Iterator[Tuple[str, str, float, float]]:
+        """Yield ``(student_id1, student_id2, cell_similarity, overall_similarity)``."""
+        return self.conn.execute(
+            "SELECT student_id1, student_id2, cell_similarity, overall_similarity "
+            "FROM pairs ORDER BY student_id1, student_id2"
+        )
@@ -0,0 +1,185 @@
+"""Finding submission zips in nested folders and inside LMS bulk-export archives.
+
+An export is one large zip holding every student's submission zip, usually in
+per-student folders. Inner zips are read straight from the export: a stored (not
+compressed) inner zip is opened through a seekable window onto the export file, so only
+its central directory and the payload members are read; a deflated one is inflated in
+memory once. Nothing is extracted to disk.
+"""
+
+import io
+import os
+import struct
+import time
+import warnings
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import IO, Dict, List, Optional, Tuple
+
+from .feature_cache import file_sha256
+
+SUBMISSION_SUFFIX = "-decision_tree_submission.zip"
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+@dataclass(frozen=True)
+class SubmissionSource:
+    """A submission zip on disk, or the ``member`` of the export archive at ``path``."""
+
+    student_id: str
+    path: str
+    member: Optional[str] = None
+    header_offset: int = 0
+    compress_type: int = zipfile.ZIP_STORED
+    compress_size: int = 0
+    file_size: int = 0
+    crc: int = 0
+    mtime: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.member or self.path)
+
+    def state(self) -> Tuple[float, int]:
+        """Return ``(mtime, size)``, which changes whenever the submission does."""
+        if self.member is None:
+            stat = os.stat(self.path)
+            return stat.st_mtime, stat.st_size
+        return self.mtime, self.file_size
+
+    def fingerprint(self) -> str:
+        """Content key for the feature cache; archive members use their CRC-32 and size."""
+        if self.member is None:
+            return file_sha256(self.path)
+        return f"crc32-{self.crc:08x}-{self.file_size}"
+
+
+class _MemberWindow(io.RawIOBase):
+    """Read-only view of ``size`` bytes at ``start`` of a shared file object."""
+
+    def __init__(self, f: IO[bytes], start: int, size: int):
+        self.f = f
+        self.start = start
+        self.size = size
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def readinto(self, buffer) -> int:
+        count = max(0, min(len(buffer), self.size - self.pos))
+        if count == 0:
+            return 0
+        # The file may be shared with other windows, so always seek first
+        self.f.seek(self.start + self.pos)
+        count = self.f.readinto(memoryview(buffer)[:count])
+        self.pos += count
+        return count
+
+
+def _archive_members(path: str) -> List[SubmissionSource]:
+    sources = []
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.endswith(SUBMISSION_SUFFIX):
+                continue
+            sources.append(
+                SubmissionSource(
+                    student_id=name.split("-")[0],
+                    path=path,
+                    member=info.filename,
+                    header_offset=info.header_offset,
+                    compress_type=info.compress_type,
+                    compress_size=info.compress_size,
+                    file_size=info.file_size,
+                    crc=info.CRC,
+                    mtime=time.mktime(info.date_time + (0, 0, -1)),
+                )
+            )
+    return sources
+
+
+def find_submission_sources(location: str) -> List[SubmissionSource]:
+    """Find the submission zips in ``location``.
+
+    ``location`` is a directory, searched recursively (hidden folders such as the feature
+    cache are skipped) with any export archives in it searched too, or an export archive.
+    A student with several submissions keeps the most recently modified one.
+    """
+    if os.path.isdir(location):
+        paths = []
+        for root, dirs, files in os.walk(location):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+    else:
+        paths = [location]
+
+    sources: Dict[str, SubmissionSource] = {}
+    duplicates = set()
+    for path in paths:
+        name = os.path.basename(path)
+        if name.endswith(SUBMISSION_SUFFIX):
+            found = [SubmissionSource(name.split("-")[0], path)]
+        elif name.endswith(".zip"):
+            try:
+                found = _archive_members(path)
+            except zipfile.BadZipFile:
+                warnings.warn(f"Skipping {path}: not a valid zip archive")
+                continue
+        else:
+            continue
+        for source in found:
+            previous = sources.get(source.student_id)
+            if previous is not None:
+                duplicates.add(source.student_id)
+                if previous.state()[0] > source.state()[0]:
+                    source = previous
+            sources[source.student_id] = source
+    for student_id in sorted(duplicates):
+        source = sources[student_id]
+        warnings.warn(
+            f"Several submissions for student {student_id}; using the latest, "
+            f"{source.member or source.path}" + (f" in {source.path}" if source.member else "")
+        )
+    return list(sources.values())
+
+
+def open_submission(source: SubmissionSource, archives: Dict[str, IO[bytes]]) -> zipfile.ZipFile:
+    """Open the submission zip of ``source``.
+
+    ``archives`` caches open export files by path so each is opened once per process;
+    the caller owns them.
+    """
+    if source.member is None:
+        return zipfile.ZipFile(source.path)
+
+    f = archives.get(source.path)
+    if f is None:
+        f = archives[source.path] = open(source.path, "rb")
+    f.seek(source.header_offset)
+    header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+    if header[0] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bad local header for {source.member} in {source.path}")
+    start = source.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+
+    if source.compress_type == zipfile.ZIP_STORED:
+        return zipfile.ZipFile(io.BufferedReader(_MemberWindow(f, start, source.file_size)))
+    if source.compress_type == zipfile.ZIP_DEFLATED:
+        f.seek(start)
+        return zipfile.ZipFile(io.BytesIO(zlib.decompress(f.read(source.compress_size), -15)))
+    with zipfile.ZipFile(source.path) as archive:
+        return zipfile.ZipFile(io.BytesIO(archive.read(source.member)))
@@ -0,0 +1,32 @@
+"""Content hashes of notebook code cells, used to drop the instructor's starter code and to
+preprocess cells that many students share only once."""
+
+import hashlib
+from typing import FrozenSet, Iterable
+
+from .notebook_reader import iter_notebook_cells
+
+
+def normalize_cell(text: str) -> str:
+    """Drop trailing whitespace, blank lines and line-ending differences."""
+    lines = (line.rstrip() for line in text.replace("\r\n", "\n").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def cell_hash(text: str) -> str:
+    return hashlib.blake2b(normalize_cell(text).encode(), digest_size=16).hexdigest()
+
+
+def template_cell_hashes(notebook_path: str) -> FrozenSet[str]:
+    """Return the hashes of the non-empty code cells of the starter notebook."""
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        return frozenset(
+            cell_hash("".join(cell["source"]))
+            for cell in iter_notebook_cells(f)
+            if cell["cell_type"] == "code" and normalize_cell("".join(cell["source"]))
+        )
+
+
+def template_digest(hashes: Iterable[str]) -> str:
+    """Short fingerprint of a template, so features extracted with it are cached apart."""
+    return hashlib.blake2b("".join(sorted(hashes)).encode(), digest_size=6).hexdigest()
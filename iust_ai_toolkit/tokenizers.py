@@ -0,0 +1,75 @@
+"""Tokenizer backends that turn notebook code into the terms used for TF-IDF similarity."""
+
+import functools
+import re
+from typing import List
+
+# Identifiers and keywords (snake_case kept whole) and numeric literals. Operators and
+# punctuation only separate tokens: TF-IDF ignores them anyway.
+_CODE_TOKEN = re.compile(r"[^\W\d]\w*|\d[\w.]*")
+
+DEFAULT_TOKENIZER = "code"
+
+
+class CodeTokenizer:
+    """Fast regex tokenizer for Python source; needs no downloaded corpora."""
+
+    name = "code"
+
+    def prepare(self):
+        pass
+
+    def tokenize(self, text: str) -> List[str]:
+        return _CODE_TOKEN.findall(text.lower())
+
+
+class NltkTokenizer:
+    """The original pipeline: NLTK ``word_tokenize``, English stop words and WordNet lemmas.
+
+    Lemmas are memoised in a bounded LRU cache since code repeats the same words a lot.
+    """
+
+    name = "nltk"
+
+    def __init__(self, lemma_cache_size: int = 65536):
+        self.lemma_cache_size = lemma_cache_size
+        self.stop_words = None
+        self._lemmatize = None
+
+    def prepare(self):
+        if self._lemmatize is not None:
+            return
+
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+
+        nltk.download("punkt", quiet=True)
+        nltk.download("stopwords", quiet=True)
+        nltk.download("wordnet", quiet=True)
+        self.stop_words = set(stopwords.words("english"))
+        self._lemmatize = functools.lru_cache(maxsize=self.lemma_cache_size)(
+            WordNetLemmatizer().lemmatize
+        )
+
+    def tokenize(self, text: str) -> List[str]:
+        from nltk.tokenize import word_tokenize
+
+        self.prepare()
+        return [
+            self._lemmatize(token)
+            for token in word_tokenize(text.lower())
+            if token.isalnum() and token not in self.stop_words
+        ]
+
+
+TOKENIZERS = {backend.name: backend for backend in (CodeTokenizer, NltkTokenizer)}
+
+
+def get_tokenizer(name: str = DEFAULT_TOKENIZER):
+    try:
+        return TOKENIZERS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown tokenizer {name!r}; choose one of {', '.join(sorted(TOKENIZERS))}"
+        ) from None
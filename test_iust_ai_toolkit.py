@@ -1,6 +1,33 @@
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+import zipfile
+from unittest import mock
 
+from click.testing import CliRunner
+
+from benchmarks.synthetic import SyntheticCohort
 from iust_ai_toolkit import course_module
+from iust_ai_toolkit.abdi_4031 import DecisionTreeSubmission
+from iust_ai_toolkit.abdi_4031.decision_tree_submission.cohort import CohortMatrices
+from iust_ai_toolkit.abdi_4031.decision_tree_submission.submission_base import _row_blocks
+from iust_ai_toolkit.cli import main, write_comparison_report
+from iust_ai_toolkit.feature_cache import FeatureCache
+from iust_ai_toolkit.lsh import MinHashLSH
+from iust_ai_toolkit.notebook_reader import iter_notebook_cells
+from iust_ai_toolkit.payload import read_payload, write_payload
+from iust_ai_toolkit.profiling import StageProfiler
+from iust_ai_toolkit.registry import COURSES
+from iust_ai_toolkit.server import ComparisonService
+from iust_ai_toolkit.submission_sources import SubmissionSource
+from iust_ai_toolkit.tokenizers import CodeTokenizer, get_tokenizer
 
 # class TestBaseAuthenticator(unittest.TestCase):
 #     def setUp(self):
@@ -127,6 +154,19 @@ from iust_ai_toolkit import course_module
 #         self.assertEqual(len(results), 3)  # 3 comparisons for 3 submissions
 
 
+def write_test_submission(directory, student_id, cells, estimations=None):
+    """Write ``<student_id>-decision_tree_submission.zip`` with the payload of ``cells``."""
+    encoded = {
+        "cells": cells,
+        "implemented_methods": ["def fit(self):"],
+        "estimations": {"acc": 0.9} if estimations is None else estimations,
+    }
+    path = os.path.join(directory, f"{student_id}-decision_tree_submission.zip")
+    with zipfile.ZipFile(path, "w") as zipf:
+        write_payload(zipf, encoded)
+    return path
+
+
 class TestCourseModule(unittest.TestCase):
     def test_course_module_import(self):
         """Test dynamic import of the decision_tree_submission module."""
@@ -141,6 +181,696 @@ class TestCourseModule(unittest.TestCase):
         # result = module.submit_notebook("test_student_id", "./test_notebook.ipynb")
         # self.assertIsNotNone(result)  # Adjust based on expected behavior
 
+    def test_registry_matches_packages(self):
+        """Every course package and assignment on disk is registered, and loads."""
+        import pkgutil
+
+        import iust_ai_toolkit
+
+        courses = {
+            name for _, name, is_pkg in pkgutil.iter_modules(iust_ai_toolkit.__path__) if is_pkg
+        }
+        self.assertEqual(courses, set(COURSES))
+        for course in COURSES.values():
+            module = course_module(course.name)
+            self.assertEqual(
+                {name for _, name, is_pkg in pkgutil.iter_modules(module.__path__) if is_pkg},
+                {assignment.name for assignment in course.assignments},
+            )
+            for assignment in course.assignments:
+                self.assertTrue(callable(assignment.load(assignment.submit)))
+                self.assertTrue(callable(assignment.load(assignment.authenticator)))
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_does_not_import_heavy_dependencies(self):
+        """The CLI entry point must start without loading numpy, pandas or sklearn."""
+        code = (
+            "import sys\n"
+            "from iust_ai_toolkit.cli import main\n"
+            "try:\n"
+            "    main(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "heavy = [m for m in ('numpy', 'pandas', 'sklearn') if m in sys.modules]\n"
+            "print('loaded:' + ','.join(heavy))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "loaded:")
+
+    def test_listing_does_not_import_courses(self):
+        code = (
+            "import sys\n"
+            "from iust_ai_toolkit.cli import main\n"
+            "for args in (['list-courses'], ['list-assignments', '--course', 'abdi_4031']):\n"
+            "    main(args, standalone_mode=False)\n"
+            "print('loaded:' + ','.join(m for m in sys.modules if 'abdi_4031' in m))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        self.assertIn("- decision_tree_submission (--project decision-tree)", output)
+        self.assertEqual(output.strip().splitlines()[-1], "loaded:")
+
+
+class TestFeatureCache(unittest.TestCase):
+    def test_round_trip_and_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = FeatureCache(os.path.join(tmp_dir, "cache"), max_size=200)
+            self.assertIsNone(cache.get("missing"))
+
+            cache.put("a", {"text": "x" * 80})
+            self.assertEqual(cache.get("a"), {"text": "x" * 80})
+
+            # Backdate "a" so it is the least recently used entry
+            os.utime(os.path.join(cache.cache_dir, "a.json"), (0, 0))
+            cache.put("b", {"text": "y" * 80})
+            cache.put("c", {"text": "z" * 80})
+
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("c"))
+            self.assertLessEqual(cache.size(), 200)
+
+            cache.clear()
+            self.assertIsNone(cache.get("c"))
+
+
+class TestNotebookReader(unittest.TestCase):
+    def test_matches_json_load_across_chunk_boundaries(self):
+        notebook = {
+            "metadata": {"kernel": {"name": "python3", "tags": [1, 2.5e3, None, True]}},
+            "cells": [
+                {
+                    "cell_type": "code",
+                    "execution_count": 12,
+                    "outputs": [{"data": {"image/png": "QUJD" * 50, "text": 'a\\"b]}'}}],
+                    "source": ["def fit(self):\n", '    return "\\n"\n'],
+                },
+                {"cell_type": "markdown", "attachments": {}, "source": "# Title"},
+            ],
+            "nbformat": 4,
+        }
+        expected = [
+            {"cell_type": cell["cell_type"], "source": cell["source"]} for cell in notebook["cells"]
+        ]
+        for indent in (None, 1):
+            text = json.dumps(notebook, indent=indent)
+            for chunk_size in (1, 2, 3, 7, 1024):
+                cells = list(iter_notebook_cells(io.StringIO(text), chunk_size=chunk_size))
+                self.assertEqual(cells, expected)
+
+
+class TestPayload(unittest.TestCase):
+    def test_round_trip_and_legacy_layout(self):
+        cells = ["def fit(self):\n    pass", "x = 'unicode ✓'"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            current_path = write_test_submission(tmp_dir, "1", cells)
+            with zipfile.ZipFile(current_path) as zipf:
+                data = read_payload(zipf)
+            self.assertEqual(data["cells"], cells)
+            self.assertEqual(data["estimations"], {"acc": 0.9})
+            with zipfile.ZipFile(current_path) as zipf:
+                self.assertEqual(zipf.namelist(), ["cells.npz", "encoded_notebook.json"])
+
+            legacy_path = os.path.join(tmp_dir, "legacy.zip")
+            legacy = {
+                "encoded_cells": [base64.b64encode(cell.encode()).decode() for cell in cells],
+                "decoded_cells": [],
+                "implemented_methods": ["def fit(self):"],
+                "estimations": {"acc": 0.9},
+            }
+            with zipfile.ZipFile(legacy_path, "w") as zipf:
+                zipf.writestr("encoded_notebook.json", json.dumps(legacy))
+            with zipfile.ZipFile(legacy_path) as zipf:
+                self.assertEqual(read_payload(zipf)["cells"], cells)
+
+
+class TestCohortMatrices(unittest.TestCase):
+    def test_block_matches_pairwise_scores(self):
+        features = [
+            {
+                "text": "gini split node",
+                "implemented_methods": ["def fit(self):", "def predict(self):"],
+                "estimations": {"acc": 0.9, "depth": 3.0},
+            },
+            {
+                "text": "gini split leaf",
+                "implemented_methods": ["def fit(self):", "def fit(self):", "def prune(self):"],
+                "estimations": {"acc": 0.9, "depth": 4.0},
+            },
+            {"text": "", "implemented_methods": [], "estimations": {}},
+        ]
+        model = DecisionTreeSubmission.fit_tfidf_model([f["text"] for f in features])
+        tfidf = DecisionTreeSubmission.transform_tfidf(model, [f["text"] for f in features])
+        cell, method, estimation, overall = CohortMatrices(tfidf, features).block(slice(None))
+
+        for i in range(3):
+            for j in range(3):
+                if i == j:
+                    continue
+                self.assertAlmostEqual(
+                    method[i, j],
+                    DecisionTreeSubmission.method_similarity(
+                        features[i]["implemented_methods"], features[j]["implemented_methods"]
+                    ),
+                )
+                self.assertAlmostEqual(
+                    estimation[i, j],
+                    DecisionTreeSubmission.estimation_similarity(
+                        features[i]["estimations"], features[j]["estimations"]
+                    ),
+                )
+        self.assertAlmostEqual(overall[0, 1], (cell[0, 1] + 1 / 3 + 1 / 2) / 3)
+
+    def test_non_finite_estimations_never_match(self):
+        estimations = [{"acc": float("nan"), "depth": 3.0}, {"acc": float("nan"), "depth": 3.0}]
+        estimations.append({"acc": float("inf"), "depth": float("-inf")})
+        features = [{"text": "", "implemented_methods": [], "estimations": e} for e in estimations]
+        tfidf = DecisionTreeSubmission.transform_tfidf(None, ["", "", ""])
+        _, _, estimation, _ = CohortMatrices(tfidf, features).block(slice(None))
+        for i in range(3):
+            for j in range(3):
+                self.assertAlmostEqual(
+                    estimation[i, j],
+                    DecisionTreeSubmission.estimation_similarity(estimations[i], estimations[j]),
+                )
+        self.assertAlmostEqual(estimation[0, 1], 1 / 2)
+
+
+class TestTiledScoring(unittest.TestCase):
+    def test_row_blocks_stay_within_budget(self):
+        for full_rows in (False, True):
+            blocks = _row_blocks(100, 500, full_rows=full_rows)
+            self.assertEqual([start for start, _ in blocks[1:]], [stop for _, stop in blocks[:-1]])
+            self.assertEqual((blocks[0][0], blocks[-1][1]), (0, 100))
+            for start, stop in blocks:
+                width = 100 if full_rows else 100 - start - 1
+                self.assertLessEqual((stop - start) * width, max(500, width))
+
+    def test_top_k_excludes_self_and_floor(self):
+        texts = ["gini split node", "gini split leaf", "entropy gain", "gini split node leaf"]
+        features = [{"text": t, "implemented_methods": [], "estimations": {}} for t in texts]
+        model = DecisionTreeSubmission.fit_tfidf_model(texts)
+        cohort = CohortMatrices(DecisionTreeSubmission.transform_tfidf(model, texts), features)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            authenticator = DecisionTreeSubmission(tmp_dir, use_cache=False)
+            (partners, *_, overall), pairs_scored, _ = authenticator.score_top_k(cohort, 0, 4, 1)
+            self.assertEqual(pairs_scored, 6)
+            self.assertEqual(partners[:, 0].tolist(), [3, 3, partners[2, 0], 0])
+            self.assertNotEqual(partners[2, 0], 2)
+
+            (partners, *_), _, _ = authenticator.score_top_k(cohort, 0, 4, 2, min_similarity=0.01)
+            self.assertEqual(sorted(partners[2].tolist()), [-1, -1])
+
+
+class TestMinHashLSH(unittest.TestCase):
+    def test_candidate_pairs(self):
+        lsh = MinHashLSH(bands=16, rows=4)
+        base = " ".join(f"token{i}" for i in range(200))
+        texts = [base, base + " extra", " ".join(f"other{i}" for i in range(200))]
+
+        candidates = lsh.candidate_pairs(lsh.signatures(texts))
+
+        self.assertIn((0, 1), candidates)
+        self.assertNotIn((0, 2), candidates)
+        self.assertAlmostEqual(lsh.expected_recall(1.0), 1.0)
+        self.assertLess(lsh.expected_recall(0.2), 0.05)
+        self.assertLess(lsh.expected_recall(lsh.threshold - 0.2), 0.5)
+        self.assertGreater(lsh.expected_recall(lsh.threshold + 0.2), 0.5)
+
+        self.assertEqual(lsh.signatures([]).shape, (0, 64))
+        self.assertEqual(lsh.candidate_pairs(lsh.signatures([])), set())
+
+
+class TestStageProfiler(unittest.TestCase):
+    def test_nested_stages_report_self_time(self):
+        profiler = StageProfiler()
+        with profiler.stage("outer"):
+            for _ in range(2):
+                with profiler.stage("inner"):
+                    sum(range(10000))
+        profiler.count("items", 3)
+
+        stats = profiler.summary()["stages"]
+        self.assertEqual(stats["inner"]["calls"], 2)
+        self.assertAlmostEqual(
+            stats["outer"]["self"], stats["outer"]["total"] - stats["inner"]["total"]
+        )
+        self.assertEqual(profiler.summary()["counters"], {"items": 3})
+        self.assertEqual([event[0] for event in profiler.events], ["inner", "inner", "outer"])
+
+
+class TestCodeTokenizer(unittest.TestCase):
+    def test_tokenizes_identifiers_and_literals(self):
+        tokens = CodeTokenizer().tokenize(
+            "def fit(self, X):\n    self.max_depth=X.shape[0]+1.5  # Gini"
+        )
+
+        self.assertEqual(
+            tokens,
+            ["def", "fit", "self", "x", "self", "max_depth", "x", "shape", "0", "1.5", "gini"],
+        )
+        with self.assertRaises(ValueError):
+            get_tokenizer("missing")
+
+
+class TestSubmissionSources(unittest.TestCase):
+    def test_reads_submissions_inside_export_archives(self):
+        cells = ["def fit(self):\n    gini = split(node)"]
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as work_dir:
+            inner_path = write_test_submission(work_dir, "1", cells)
+            with zipfile.ZipFile(inner_path, "a") as zipf:
+                zipf.writestr("main.ipynb", "{}")
+            with open(inner_path, "rb") as f:
+                inner = f.read()
+            for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                with zipfile.ZipFile(
+                    os.path.join(tmp_dir, f"export{compression}.zip"), "w"
+                ) as export:
+                    for student_id in ("1", "2"):
+                        export.writestr(
+                            f"Student {student_id}_assignsubmission_file_/"
+                            f"{compression}{student_id}-decision_tree_submission.zip",
+                            inner,
+                            compress_type=compression,
+                        )
+
+            for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                with DecisionTreeSubmission(tmp_dir, use_cache=False) as authenticator:
+                    names = authenticator.find_submissions(
+                        os.path.join(tmp_dir, f"export{compression}.zip")
+                    )
+                    self.assertEqual(len(names), 2)
+                    student_id = names[1].split("-")[0]
+                    self.assertEqual(authenticator.load_encoded_data(student_id)["cells"], cells)
+                    (archive,) = authenticator._archives.values()
+                self.assertTrue(archive.closed)
+                self.assertEqual(authenticator._archives, {})
+            # Both exports are found when searching the folder
+            self.assertEqual(len(DecisionTreeSubmission(tmp_dir).find_submissions()), 4)
+
+
+class TestTemplateCells(unittest.TestCase):
+    def test_drops_starter_cells_and_reuses_shared_ones(self):
+        starter = "import numpy as np\nX, y = load_data()\n"
+        notebook = {
+            "cells": [{"cell_type": "code", "source": [starter], "outputs": [], "metadata": {}}],
+            "metadata": {},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            template = os.path.join(tmp_dir, "template.ipynb")
+            with open(template, "w", encoding="utf-8") as f:
+                json.dump(notebook, f)
+            authenticator = DecisionTreeSubmission(tmp_dir, use_cache=False, template=template)
+            plain = DecisionTreeSubmission(tmp_dir, use_cache=False)
+        self.assertNotEqual(authenticator.feature_version, plain.feature_version)
+
+        data = {
+            # Whitespace-only edits still match the template
+            "cells": [starter.replace("\n", "  \r\n"), "def fit(self):\n    gini = split(node)"],
+            "implemented_methods": ["def fit(self):"],
+            "estimations": {},
+        }
+        authenticator.profiler = profiler = StageProfiler()
+        self.assertEqual(
+            authenticator.extract_features(data)["text"], "def fit self gini split node"
+        )
+        authenticator.extract_features(data)
+        self.assertEqual(profiler.counters["template_cells"], 2)
+        self.assertEqual(profiler.counters["shared_cells"], 1)
+        self.assertIn("load_data", plain.extract_features(data)["text"])
+
+
+class TestSubmissionCsv(unittest.TestCase):
+    def test_streams_arrays_and_generators(self):
+        import gzip
+
+        import numpy as np
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            authenticator = DecisionTreeSubmission(tmp_dir, use_cache=False)
+            path = os.path.join(tmp_dir, "submission.csv")
+            self.assertEqual(authenticator.create_submission_csv(np.array([[0.5], [2.0]]), path), 2)
+            with open(path) as f:
+                self.assertEqual(f.read(), "id,prediction\n1,0.5\n2,2.0\n")
+
+            path = os.path.join(tmp_dir, "submission.csv.gz")
+            labels = (label for label in ["yes", "no, really", "yes"])
+            self.assertEqual(authenticator.create_submission_csv(labels, path), 3)
+            with gzip.open(path, "rt") as f:
+                self.assertEqual(f.read(), 'id,prediction\n1,yes\n2,"no, really"\n3,yes\n')
+
+
+class TestPackSubmissions(unittest.TestCase):
+    def test_batch_packaging_is_reproducible(self):
+        notebook = {
+            "cells": [
+                {
+                    "cell_type": "code",
+                    "source": ["def fit(self):\n", "    # Estimation: depth: 3\n"],
+                    "outputs": [],
+                    "metadata": {},
+                }
+            ],
+            "metadata": {},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            notebook_path = os.path.join(tmp_dir, "main.ipynb")
+            with open(notebook_path, "w", encoding="utf-8") as f:
+                json.dump(notebook, f)
+            # Outside the manifest, so never packed
+            with open(os.path.join(tmp_dir, "decision_tree.py"), "w") as f:
+                f.write("class DecisionTree: pass\n")
+            model_path = os.path.join(tmp_dir, "model.py")
+            with open(model_path, "w") as f:
+                f.write("class DecisionTree: ...\n")
+            jobs = [
+                ("1", notebook_path, None),
+                ("2", os.path.join(tmp_dir, "missing.ipynb"), None),
+                ("3", notebook_path, model_path),
+                ("4", notebook_path, os.path.join(tmp_dir, "missing.py")),
+            ]
+            contents = []
+            for run in ("a", "b"):
+                output_dir = os.path.join(tmp_dir, run)
+                authenticator = DecisionTreeSubmission(output_dir, use_cache=False)
+                results = list(authenticator.pack_submissions(jobs, output_dir, compresslevel=9))
+                self.assertEqual(
+                    [error is None for *_, error in results], [True, False, True, False]
+                )
+                with open(results[0][1], "rb") as f:
+                    contents.append(f.read())
+            self.assertEqual(contents[0], contents[1])
+            with zipfile.ZipFile(results[2][1]) as zipf:
+                self.assertEqual(zipf.read("decision_tree.py"), b"class DecisionTree: ...\n")
+
+            with zipfile.ZipFile(io.BytesIO(contents[0])) as zipf:
+                self.assertEqual(zipf.getinfo("main.ipynb").compress_type, zipfile.ZIP_DEFLATED)
+                self.assertNotIn("decision_tree.py", zipf.namelist())
+                data = read_payload(zipf)
+        self.assertEqual(data["implemented_methods"], ["def fit(self):"])
+        self.assertEqual(data["estimations"], {"depth": 3.0})
+
+
+class TestAutograder(unittest.TestCase):
+    MODEL = (
+        "class DecisionTree:\n"
+        "    def __init__(self, threshold=0.0):\n"
+        "        self.threshold = threshold\n"
+        "    def fit(self, X, y):\n"
+        "        pass\n"
+        "    def predict(self, X):\n"
+        "        return [int(row[0] > self.threshold) for row in X]\n"
+    )
+
+    def test_grades_each_submission_in_isolation(self):
+        from iust_ai_toolkit.grading import Autograder, prepare_dataset
+        from iust_ai_toolkit.submission_sources import find_submission_sources
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "data.csv"), "w") as f:
+                f.write("x,label\n" + "".join(f"{x},{int(x > 0)}\n" for x in range(-5, 5)))
+            prepare_dataset(os.path.join(tmp_dir, "data.csv"), os.path.join(tmp_dir, "data.npz"))
+            submissions = {
+                "1": self.MODEL,
+                "2": self.MODEL.replace("pass", "while True: pass"),
+                "3": None,
+            }
+            for student_id, code in submissions.items():
+                name = f"{student_id}-decision_tree_submission.zip"
+                with zipfile.ZipFile(os.path.join(tmp_dir, name), "w") as zipf:
+                    if code is not None:
+                        zipf.writestr("decision_tree.py", code)
+            with open(os.path.join(tmp_dir, "4-decision_tree_submission.zip"), "wb") as f:
+                f.write(b"not a zip archive")
+
+            grader = Autograder(
+                {"data": os.path.join(tmp_dir, "data.npz")}, params={"threshold": 0}, timeout=1.0
+            )
+            rows = {
+                row["student_id"]: row
+                for rows in grader.grade(find_submission_sources(tmp_dir))
+                for row in rows
+            }
+        self.assertEqual(rows["1"]["status"], "ok")
+        self.assertEqual(rows["1"]["accuracy"], 1.0)
+        self.assertIn(rows["2"]["status"], ("timeout", "cpu_limit"))
+        self.assertEqual(rows["3"]["status"], "missing")
+        self.assertEqual(rows["4"]["status"], "bad_zip")
+
+
+class TestComparisonService(unittest.TestCase):
+    def test_scores_new_arrivals_once_settled(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_test_submission(tmp_dir, "1", ["def fit(self):\n    gini = split(node)"])
+            write_test_submission(tmp_dir, "2", ["def fit(self):\n    gini = split(leaf)"])
+            service = ComparisonService(DecisionTreeSubmission(tmp_dir, use_cache=False))
+            self.assertEqual(service.refresh()["scored"], 2)
+
+            write_test_submission(tmp_dir, "3", ["def fit(self):\n    split = gini(node)"])
+            self.assertIsNone(service.poll())  # not settled yet
+            self.assertEqual(service.poll()["scored"], 1)
+            self.assertIsNone(service.poll())
+
+            pairs = service.pairs("3", 0.0, 10)["pairs"]
+            self.assertEqual(
+                {(p["student_id1"], p["student_id2"]) for p in pairs}, {("1", "3"), ("2", "3")}
+            )
+            self.assertEqual(service.status()["submissions"], 3)
+
+            matches = service.nearest("1", 2)["matches"]
+            self.assertEqual([m["student_id"] for m in matches], ["3", "2"])
+            self.assertGreater(matches[0]["cell_similarity"], matches[1]["cell_similarity"])
+
+    def test_keeps_pairs_of_zips_being_overwritten(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_test_submission(tmp_dir, "1", ["def fit(self):\n    gini = split(node)"])
+            write_test_submission(tmp_dir, "2", ["def fit(self):\n    gini = split(leaf)"])
+            service = ComparisonService(DecisionTreeSubmission(tmp_dir, use_cache=False))
+            service.refresh()
+
+            write_test_submission(tmp_dir, "1", ["def fit(self):\n    split = gini(node, leaf)"])
+            self.assertIsNone(service.poll())  # not settled yet
+            self.assertEqual(len(service.pairs("1", 0.0, 10)["pairs"]), 1)
+            self.assertEqual(service.poll()["changed"], 1)
+            self.assertEqual(len(service.pairs("1", 0.0, 10)["pairs"]), 1)
+
+    def test_fits_tfidf_once_submissions_arrive(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            service = ComparisonService(DecisionTreeSubmission(tmp_dir, use_cache=False))
+            self.assertEqual(service.refresh()["scored"], 0)
+
+            cells = ["def fit(self):\n    gini = split(node)"]
+            write_test_submission(tmp_dir, "1", cells)
+            write_test_submission(tmp_dir, "2", ["def predict(self, row):\n    return leaf"])
+            write_test_submission(tmp_dir, "3", cells)
+            self.assertEqual(service.refresh()["scored"], 3)
+            (pair,) = service.pairs("3", 0.9, 10)["pairs"]
+            self.assertEqual((pair["student_id1"], pair["student_id2"]), ("1", "3"))
+            self.assertAlmostEqual(pair["cell_similarity"], 1.0)
+            self.assertTrue(pair["potential_cheating"])
+
+            # Mostly unseen terms: the model is refitted and every pair rescored
+            write_test_submission(tmp_dir, "4", ["def prune(tree):\n    entropy = gain(depth)"])
+            self.assertEqual(service.refresh()["scored"], 4)
+            self.assertAlmostEqual(service.pairs("3", 0.9, 10)["pairs"][0]["cell_similarity"], 1.0)
+
+    def test_nearest_matches_index_and_changed_zips(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_test_submission(tmp_dir, "1", ["def fit(self):\n    gini = split(node)"])
+            write_test_submission(tmp_dir, "2", ["def fit(self):\n    gini = split(leaf)"])
+            authenticator = DecisionTreeSubmission(tmp_dir, use_cache=False)
+            service = ComparisonService(authenticator)
+            service.refresh()
+            # Scored with the model fitted on the first two submissions
+            write_test_submission(tmp_dir, "3", ["def fit(self):\n    leaf = split(leaf)"])
+            service.refresh()
+            stored = {
+                p["student_id2"]: p["cell_similarity"] for p in service.pairs("1", 0.0, 10)["pairs"]
+            }
+            for match in service.nearest("1", 2)["matches"]:
+                self.assertAlmostEqual(match["cell_similarity"], stored[match["student_id"]])
+
+            submissions = authenticator.find_submissions()
+            self.assertEqual(authenticator.nearest("1", 1, submissions)[0]["student_id"], "2")
+            # Unchanged zips are not hashed again
+            with mock.patch.object(SubmissionSource, "fingerprint", side_effect=AssertionError):
+                self.assertEqual(authenticator.nearest("1", 1, submissions)[0]["student_id"], "2")
+            write_test_submission(tmp_dir, "3", ["def fit(self):\n    gini = split(node)"])
+            (match,) = authenticator.nearest("1", 1, submissions)
+            self.assertEqual(match["student_id"], "3")
+            self.assertAlmostEqual(match["cell_similarity"], 1.0)
+
+    def test_rebuild_and_memo_pruning(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for student_id in "123":
+                write_test_submission(tmp_dir, student_id, [f"def fit(self):\n    x{student_id}"])
+            authenticator = DecisionTreeSubmission(tmp_dir, use_cache=False)
+            service = ComparisonService(authenticator)
+            service.refresh()
+            self.assertEqual(len(authenticator._features), 3)
+
+            os.remove(os.path.join(tmp_dir, "3-decision_tree_submission.zip"))
+            write_test_submission(tmp_dir, "2", ["def fit(self):\n    x1 = x2"])
+            self.assertEqual(service.refresh()["scored"], 1)
+            self.assertEqual(len(authenticator._features), 2)
+
+            self.assertEqual(service.refresh(rebuild=True)["scored"], 2)
+
+
+class TestCompareSubmissions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.directory = os.path.join(cls.tmp_dir.name, "submissions")
+        cohort = SyntheticCohort(size=12, code_cells=4, lines_per_cell=6, plagiarism_rate=0.25)
+        notebooks = cohort.write_notebooks(os.path.join(cls.tmp_dir.name, "notebooks"))
+        cls.submissions = cohort.write_submissions(notebooks, cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def compare(self, directory, *args):
+        output = os.path.join(directory, "report.csv")
+        result = CliRunner().invoke(
+            main,
+            ["compare-submissions", "--directory", directory, "--output", output, *args],
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(output, newline="") as f:
+            return list(csv.reader(f))[1:], result.output
+
+    def test_filtered_runs_count_every_scored_pair(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for student_id in range(10):
+                write_test_submission(
+                    tmp_dir, student_id, ["def fit(self):\n    gini = split(node)"]
+                )
+            for args in ([], ["--top-k", "1"], ["--min-similarity", "0.99"]):
+                rows, output = self.compare(tmp_dir, "--no-cache", *args)
+                self.assertTrue(rows)
+                self.assertEqual({row[3] for row in rows}, {"Ignored"}, args)
+                self.assertIn("Potential cheating cases: 45", output)
+
+    def test_report_matches_in_memory_analysis(self):
+        authenticator = DecisionTreeSubmission(self.directory, use_cache=False)
+        results, verbose_results, ignore_cheating = authenticator.analyze_all_submissions(
+            self.submissions
+        )
+        self.assertEqual(len(results), 12 * 11 // 2)
+        self.assertFalse(ignore_cheating)
+        # Plagiarised copies stand out against the cohort-wide TF-IDF model
+        self.assertTrue(any(authenticator.is_potential_cheating(s) for *_, s in results))
+        self.assertEqual(
+            [(a, b, s, verbose_results[f"{a}-{b}"]) for a, b, s in results],
+            list(authenticator.iter_pair_results(self.submissions)),
+        )
+
+        rows, _ = self.compare(self.directory, "--no-cache")
+        self.assertEqual([(a, b) for a, b, *_ in rows], [(a, b) for a, b, _ in results])
+        for row, (_, _, similarity) in zip(rows, results):
+            self.assertAlmostEqual(float(row[2]), similarity)
+            self.assertEqual(row[3], "Yes" if similarity > 0.8 else "No")
+
+    def test_approximate_rate_counts_unscored_pairs(self):
+        rows, output = self.compare(self.directory, "--no-cache", "--approximate")
+        expected, _ = self.compare(self.directory, "--no-cache")
+        flagged = {(a, b) for a, b, _, label in expected if label == "Yes"}
+        self.assertTrue(flagged)
+        # Pairs LSH never scored count as not cheating rather than shrinking the rate
+        self.assertNotIn("Ignored", {row[3] for row in rows})
+        approximate = {(a, b) for a, b, _, label in rows if label == "Yes"}
+        self.assertTrue(approximate)
+        self.assertLessEqual(approximate, flagged)
+
+    def test_worker_count_does_not_change_the_report(self):
+        reports = []
+        for workers in ("1", "3"):
+            rows, _ = self.compare(self.directory, "--no-cache", "--verbose", "--workers", workers)
+            with open(os.path.join(self.directory, "report_verbose.jsonl")) as f:
+                reports.append((rows, f.read()))
+        self.assertEqual(reports[0], reports[1])
+
+    def test_workers_use_the_authenticator_thresholds(self):
+        counts = []
+        for workers in (1, 3):
+            authenticator = DecisionTreeSubmission(self.directory, use_cache=False)
+            authenticator.cheating_threshold = 0.2
+            stats = {}
+            list(authenticator.iter_pair_results(self.submissions, workers=workers, stats=stats))
+            counts.append(stats["potential_cheating"])
+        # The default threshold only flags the plagiarised copies
+        self.assertGreater(counts[0], 4)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_streamed_report_and_relabel(self):
+        rows, output = self.compare(self.directory, "--no-cache", "--verbose")
+        with open(os.path.join(self.directory, "report_verbose.jsonl")) as f:
+            verbose = [json.loads(line) for line in f]
+        self.assertEqual([v["pair"] for v in verbose], [f"{a}-{b}" for a, b, *_ in rows])
+        self.assertIn("cell_similarity", verbose[0])
+        self.assertIn(f"Total comparisons: {len(rows)}", output)
+        self.assertNotIn("Ignored", {row[3] for row in rows})
+
+        # Flagged pairs are relabelled once the whole cohort turns out to be above the rate
+        authenticator = DecisionTreeSubmission(self.directory, use_cache=False)
+        authenticator.ignore_cheating_percentage = 0.0
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = os.path.join(tmp_dir, "report.csv")
+            total, potential = write_comparison_report(
+                authenticator, authenticator.iter_pair_results(self.submissions), report
+            )
+            with open(report, newline="") as f:
+                relabelled = list(csv.reader(f))[1:]
+            self.assertEqual(os.listdir(tmp_dir), ["report.csv"])
+        self.assertEqual(total, len(rows))
+        self.assertEqual(potential, sum(row[3] == "Yes" for row in rows))
+        self.assertEqual([row[:2] for row in relabelled], [row[:2] for row in rows])
+        self.assertEqual({row[3] for row in relabelled}, {"Ignored"})
+
+    def test_incremental_index_resumes_after_interruption(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = shutil.copytree(self.directory, os.path.join(tmp_dir, "submissions"))
+            authenticator = DecisionTreeSubmission(directory, use_cache=False)
+            self.assertEqual(authenticator.refresh_index(self.submissions)["pending"], 12)
+
+            scored = []
+
+            def interrupt():
+                scored.append(1)
+                if len(scored) == 5:
+                    raise KeyboardInterrupt
+
+            with self.assertRaises(KeyboardInterrupt):
+                authenticator.score_index(progress_callback=interrupt)
+            stats = authenticator.refresh_index(self.submissions)
+            self.assertEqual((stats["changed"], stats["pending"]), (0, 7))
+            self.assertEqual(authenticator.score_index(), 7)
+
+            rows, output = self.compare(directory, "--no-cache", "--incremental")
+            self.assertIn("0 new or changed, 0 removed, 0 to score", output)
+        expected, _ = self.compare(self.directory, "--no-cache")
+        self.assertEqual(len(rows), len(expected))
+        stored = {(a, b): (float(s), label) for a, b, s, label in rows}
+        for a, b, similarity, label in expected:
+            self.assertAlmostEqual(stored[(a, b)][0], float(similarity))
+            self.assertEqual(stored[(a, b)][1], label)
+
 
 if __name__ == "__main__":
     unittest.main()